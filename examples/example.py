@@ -35,6 +35,11 @@ data0, data1, freq = vna.sweep()
 print("Single sweep done:", data0)
 
 
+# A sweep also keeps the raw data, timestamps and derived values.
+sweep = vna.sweep()
+print("Sweep", sweep.sequence, "took", sweep.duration, "s, s11 in dB:", sweep.s11_db)
+
+
 # Stream continuous sweeps and process the data.
 for data0, data1, freq in vna.stream():
     # Use the streamed data inside this loop.
@@ -43,3 +43,12 @@ for values0, values1 in zip(stream0, stream1):
 
 # Note that if the NanoVNAs differ in model or setup values, there will probably be a time difference
 # between sweeps. This might cause errors when iterating the streams at the same time.
+
+
+# MultiVNA sweeps every device in its own thread, so the slowest device does not set the pace.
+# With the "nearest" policy each set holds the sweeps closest in time to each other.
+multi = pynanovna.MultiVNA([vna0, vna1], policy="nearest")
+with multi:
+    for sweep0, sweep1 in multi:
+        print(sweep0.start_time, sweep0.s11, sweep1.start_time, sweep1.s11)
+        break
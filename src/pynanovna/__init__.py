@@ -1,5 +1,7 @@
 from .pynanovna import *
 from .vis import *
 from .utils import *
+from .aio import AsyncVNA
+from .multi import MultiVNA
 
 #  Needed to import the directory as a regular package.
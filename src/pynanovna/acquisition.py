@@ -0,0 +1,203 @@
+"""
+Continuous acquisition in a background thread.
+"""
+
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+from .sweep import Sweep
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("block", "drop_oldest", "latest")
+
+_Entry = namedtuple("_Entry", "slot sweep")
+
+
+class Acquisition:
+    def __init__(self, vna, size: int = 8, policy: str = "drop_oldest"):
+        """Sweep continuously in a thread into a ring buffer of sweeps.
+
+        The buffer holds `size` sweeps in arrays allocated once, so the
+        device keeps sweeping while the consumer processes data. A sweep
+        returned by `get` stays valid until the next call to `get`, after
+        that its arrays are reused, so copy what you want to keep.
+
+        Policies when the consumer falls behind:
+            "block": The device waits for the consumer, no sweep is lost.
+            "drop_oldest": The oldest buffered sweep is dropped.
+            "latest": Only the newest sweep is kept, `get` always returns
+                the freshest data.
+
+        `overruns` counts the sweeps dropped, or with "block" the times the
+        device had to wait for the consumer. `underruns` counts the times
+        `get` had to wait for a sweep.
+
+        Args:
+            vna (VNA): The VNA to sweep, with the sweep already set.
+            size (int): Number of sweeps buffered. Defaults to 8.
+            policy (str): "block", "drop_oldest" or "latest". Defaults to
+                "drop_oldest".
+
+        Raises:
+            ValueError: If the size or policy is invalid.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}, not {policy!r}")
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self.vna = vna
+        self.size = size
+        self.policy = policy
+        self.overruns = 0
+        self.underruns = 0
+        # One slot more than the buffer, for the sweep held by the consumer.
+        self._slots = [None] * (size + 1)
+        self._free = deque(range(size + 1))
+        self._ready = deque()
+        self._held = None
+        self._condition = threading.Condition()
+        self._running = False
+        self._error = None
+        self._thread = None
+
+    def start(self) -> "Acquisition":
+        """Start sweeping in the background."""
+        if self._running:
+            return self
+        self._running = True
+        self._error = None
+        self._thread = threading.Thread(
+            target=self._run, name="pynanovna acquisition", daemon=True
+        )
+        self._thread.start()
+        logger.debug("Acquisition started, %d slots, %s", self.size, self.policy)
+        return self
+
+    def stop(self):
+        """Stop sweeping and wait for the thread to finish."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        logger.debug(
+            "Acquisition stopped, %d overruns, %d underruns",
+            self.overruns,
+            self.underruns,
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def __enter__(self) -> "Acquisition":
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _slot(self, index: int, points: int) -> tuple[np.ndarray, ...]:
+        """Get the raw and calibrated arrays of a slot, allocated per grid size."""
+        slot = self._slots[index]
+        if slot is None or len(slot[0]) != points:
+            slot = self._slots[index] = tuple(
+                np.empty(points, dtype=np.complex128) for _ in range(4)
+            )
+        return slot
+
+    def _take_free_slot(self) -> int:
+        with self._condition:
+            if not self._free:
+                self.overruns += 1
+                if self.policy == "block":
+                    while not self._free and self._running:
+                        self._condition.wait()
+                    if not self._running:
+                        return None
+                else:
+                    self._free.append(self._ready.popleft().slot)
+            return self._free.popleft()
+
+    def _run(self):
+        try:
+            while self._running:
+                if (index := self._take_free_slot()) is None:
+                    break
+                start_time = time.time()
+                data0, data1, frequencies = self.vna.vna.read_sweep()
+                raw_s11, raw_s21, s11, s21 = self._slot(index, len(data0))
+                np.copyto(raw_s11, data0)
+                np.copyto(raw_s21, data1)
+                entry = _Entry(
+                    index,
+                    self.vna._new_sweep(
+                        start_time, raw_s11, raw_s21, frequencies, (s11, s21)
+                    ),
+                )
+                with self._condition:
+                    self._ready.append(entry)
+                    if self.policy == "latest":
+                        while len(self._ready) > 1:
+                            self._free.append(self._ready.popleft().slot)
+                            self.overruns += 1
+                    self._condition.notify_all()
+        except Exception as e:
+            logger.critical("Exception in acquisition: %s", e, exc_info=True)
+            with self._condition:
+                self._error = e
+                self._running = False
+                self._condition.notify_all()
+
+    def get(self, timeout: float = None) -> Sweep:
+        """Get the next sweep, the oldest buffered or, with "latest", the newest.
+
+        Args:
+            timeout (float): Seconds to wait for a sweep. Defaults to None,
+                wait until there is one.
+
+        Raises:
+            TimeoutError: If no sweep arrived in time.
+            RuntimeError: If the acquisition is stopped, or failed.
+
+        Returns:
+            Sweep: The sweep, valid until the next call to get.
+        """
+        with self._condition:
+            if self._held is not None:
+                self._free.append(self._held)
+                self._held = None
+                self._condition.notify_all()
+            if not self._ready:
+                self.underruns += 1
+                deadline = None if timeout is None else time.monotonic() + timeout
+                while not self._ready and self._running:
+                    remaining = None
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise TimeoutError("No sweep acquired in time.")
+                    self._condition.wait(remaining)
+            if not self._ready:
+                if self._error is not None:
+                    raise RuntimeError("Acquisition failed.") from self._error
+                raise RuntimeError("Acquisition is not running.")
+            entry = self._ready.popleft()
+            self._held = entry.slot
+            return entry.sweep
+
+    def __iter__(self):
+        """Yield sweeps until the acquisition is stopped."""
+        while True:
+            try:
+                yield self.get()
+            except RuntimeError:
+                if self._error is not None:
+                    raise
+                return
+
@@ -0,0 +1,241 @@
+"""
+asyncio interface for the NanoVNA.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Generator
+
+from .hardware.Serial import (
+    ClearInput,
+    ReadExact,
+    ResponseFramer,
+    SkipUntil,
+    Sleep,
+    TextCommand,
+    Write,
+)
+from .pynanovna import VNA
+from .sweep import Sweep
+
+logger = logging.getLogger(__name__)
+
+# Poll interval for ports that cannot be watched by the event loop.
+POLL_INTERVAL = 0.001
+
+
+class AsyncSerial:
+    def __init__(self, serial_port):
+        """Non-blocking reads on a serial port for asyncio.
+
+        Reads wait for the port to become readable in the event loop, on
+        platforms where the loop cannot watch the port (Windows) the port
+        is polled instead. Either way no thread is used.
+
+        Args:
+            serial_port (serial.Serial): The open port.
+        """
+        self.serial = serial_port
+        self._lock = None
+        try:
+            self._fd = serial_port.fileno()
+        except (AttributeError, OSError, ValueError):
+            self._fd = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        """Lock serializing transactions, created in the running event loop.
+
+        Before Python 3.10 a lock binds to the loop of the thread creating
+        it, and there may be none when the port is wrapped.
+        """
+        if self._lock is None:
+            asyncio.get_running_loop()
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def _readable(self, timeout: float):
+        loop = asyncio.get_running_loop()
+        if self._fd is not None:
+            future = loop.create_future()
+
+            def ready():
+                if not future.done():
+                    future.set_result(None)
+
+            try:
+                loop.add_reader(self._fd, ready)
+            except NotImplementedError:
+                self._fd = None
+            else:
+                try:
+                    await asyncio.wait_for(future, timeout)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    loop.remove_reader(self._fd)
+                return
+        await asyncio.sleep(min(POLL_INTERVAL, max(timeout, 0)))
+
+    async def read(self, size: int, deadline: float) -> bytes:
+        """Read up to size bytes, at least one unless the deadline passed.
+
+        Args:
+            size (int): Maximum number of bytes.
+            deadline (float): time.monotonic() value to give up at.
+
+        Returns:
+            bytes: The data, empty at the deadline.
+        """
+        while not (waiting := self.serial.in_waiting):
+            if (remaining := deadline - time.monotonic()) <= 0:
+                return b""
+            await self._readable(remaining)
+        return self.serial.read(min(waiting, size))
+
+    async def read_exact(self, size: int, deadline: float) -> bytes:
+        """Read exactly size bytes.
+
+        Raises:
+            IOError: If the bytes do not arrive before the deadline.
+        """
+        data = bytearray()
+        while len(data) < size:
+            if not (chunk := await self.read(size - len(data), deadline)):
+                raise IOError(f"timeout reading {size} bytes, got {len(data)}")
+            data += chunk
+        return bytes(data)
+
+    async def skip_until(self, expected: bytes, deadline: float):
+        """Discard input up to and including expected.
+
+        Raises:
+            IOError: If expected does not arrive before the deadline.
+        """
+        buffer = bytearray()
+        while not buffer.endswith(expected):
+            if not (chunk := await self.read(1, deadline)):
+                raise IOError(f"timeout waiting for {expected}, got: {bytes(buffer)}")
+            buffer += chunk
+
+    async def read_response(self, echo: bytes, timeout: float) -> bytes:
+        """Read the response of a text command, see Serial.read_response."""
+        deadline = time.monotonic() + timeout
+        framer = ResponseFramer(echo)
+        while True:
+            response = framer.feed(await self.read(1 << 16, deadline))
+            if response is not None:
+                return response
+            if time.monotonic() > deadline:
+                return framer.timeout()
+
+    def write(self, data: bytes):
+        self.serial.write(data)
+
+    async def text_command(self, command: str, timeout: float) -> bytes:
+        """Run a text command, see Serial.text_command."""
+        logger.debug("exec_command(%s)", command)
+        self.serial.reset_input_buffer()
+        self.write(f"{command}\r".encode("ascii"))
+        return await self.read_response(f"{command}\r\n".encode("ascii"), timeout)
+
+    async def run_step(self, step: tuple):
+        """Do one I/O step of a transaction, see Serial.run_step."""
+        if isinstance(step, TextCommand):
+            return await self.text_command(step.command, step.timeout)
+        if isinstance(step, ReadExact):
+            return await self.read_exact(step.size, step.deadline)
+        if isinstance(step, Write):
+            self.write(step.data)
+        elif isinstance(step, ClearInput):
+            self.serial.reset_input_buffer()
+        elif isinstance(step, SkipUntil):
+            await self.skip_until(step.expected, step.deadline)
+        elif isinstance(step, Sleep):
+            await asyncio.sleep(step.seconds)
+        else:
+            raise TypeError(f"Unknown I/O step: {step}")
+        return None
+
+    async def run(self, transaction: Generator):
+        """Run a driver transaction, see Serial.run_transaction.
+
+        Returns:
+            The return value of the generator.
+        """
+        async with self.lock:
+            reply = None
+            while True:
+                try:
+                    step = transaction.send(reply)
+                except StopIteration as done:
+                    return done.value
+                reply = await self.run_step(step)
+
+
+class AsyncVNA:
+    def __init__(self, vna: VNA):
+        """asyncio interface to a connected VNA.
+
+        Sweeps and commands run the transactions of the driver, the same
+        code as the blocking methods, on non-blocking serial I/O, so one
+        event loop can drive several devices. Calibration, port extension
+        and calibration library of the VNA are used as is.
+
+        Do not use the blocking methods of the VNA while the AsyncVNA is in use.
+
+        Args:
+            vna (VNA): The connected VNA.
+        """
+        self.vna = vna
+        self.device = vna.vna
+        self.port = AsyncSerial(self.device.serial)
+
+    @classmethod
+    async def connect(cls, vna_index: int = 0, logging_level: str = "info"):
+        """Find and connect to a NanoVNA.
+
+        The handshake is done once in the default executor.
+
+        Args:
+            vna_index (int): If multiple NanoVNAs are connected you can specify which to use.
+            logging_level (str): The level of outputs. 'critical', 'info' or 'debug'. Defaults to 'info'.
+
+        Raises:
+            IOError: If no NanoVNA was found.
+
+        Returns:
+            AsyncVNA: The connected VNA.
+        """
+        loop = asyncio.get_running_loop()
+        vna = await loop.run_in_executor(None, VNA, vna_index, logging_level)
+        if not vna.connected:
+            raise IOError("NanoVNA not found, is it connected and turned on?")
+        return cls(vna)
+
+    async def exec_raw(self, command: str) -> bytes:
+        """Run a text command and return its raw output, see VNABase.exec_raw."""
+        return await self.port.run(self.device.command_steps(command))
+
+    async def set_sweep(self, start: float, stop: float, points: int):
+        """Set the sweep parameters, see VNA.set_sweep."""
+        await self.port.run(self.vna.set_sweep_steps(start, stop, points))
+
+    async def sweep(self) -> Sweep:
+        """Run a single sweep, see VNA.sweep.
+
+        Returns:
+            Sweep: The sweep, unpacks as s11, s21, frequencies.
+        """
+        return await self.port.run(self.vna.sweep_steps())
+
+    async def stream(self):
+        """Sweep continuously, see VNA.stream.
+
+        Yields:
+            Sweep: Yields a sweep when new data is available.
+        """
+        logger.debug("Starting stream.")
+        while True:
+            yield await self.sweep()
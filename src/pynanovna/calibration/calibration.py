@@ -1,11 +1,11 @@
 import logging
 import cmath
+import copy
 import math
 import os
 import re
 import numpy as np
-from collections import defaultdict, UserDict
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, fields, replace
 
 from scipy.interpolate import interp1d
 
@@ -15,6 +15,12 @@ IDEAL_OPEN = complex(1, 0)
 IDEAL_LOAD = complex(0, 0)
 IDEAL_THROUGH = complex(1, 0)
 
+CAL_NPZ_FORMAT = 1
+NPZ_MAGIC = b"PK\x03\x04"
+
+STANDARDS = ("short", "open", "load", "through", "thrurefl", "isolation")
+ERROR_TERMS = ("e00", "e11", "delta_e", "e10e01", "e30", "e22", "e10e32")
+
 RXP_CAL_HEADER = re.compile(
     r"""
     ^ \# \s+ Hz \s+
@@ -43,6 +49,19 @@ RXP_CAL_LINE = re.compile(
     re.VERBOSE,
 )
 
+# Characters of the data lines accepted by RXP_CAL_LINE, which has no "+",
+# "inf" or "nan" unlike float(). Checked by the bulk parser in one pass.
+CAL_DATA_CHARS = b"-0123456789Ee. \t\n"
+
+# Standards stored by the line formats, by number of columns.
+CAL_COLUMNS = {
+    7: ("short", "open", "load"),
+    9: ("short", "open", "load", "through"),
+    # short data (without thrurefl)
+    11: ("short", "open", "load", "through", "isolation"),
+    13: STANDARDS,
+}
+
 logger = logging.getLogger(__name__)
 
 
@@ -127,31 +146,118 @@ class CalElement:
     through_length: float = 0.0
 
 
-class CalDataSet(UserDict):
+@dataclass
+class PortExtension:
+    delay1: float = 0.0  # s, one way, port 1
+    delay2: float = 0.0  # s, one way, port 2
+    loss1: float = 0.0  # dB, one way, port 1
+    loss2: float = 0.0  # dB, one way, port 2
+
+    def is_active(self) -> bool:
+        return any((self.delay1, self.delay2, self.loss1, self.loss2))
+
+    def factors(self, frequencies: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Compensation factors for s11 and s21 on a frequency grid.
+
+        S11 passes port 1 twice, S21 passes port 1 and port 2 once each.
+
+        Args:
+            frequencies (np.ndarray): Frequencies of the sweep.
+
+        Returns:
+            tuple: s11 and s21 factors as complex arrays.
+        """
+        phase = -2j * math.pi * np.asarray(frequencies, dtype=np.float64)
+        factor11 = np.exp(phase * (2 * self.delay1))
+        factor21 = np.exp(phase * (self.delay1 + self.delay2))
+        if self.loss1 or self.loss2:
+            factor11 *= 10 ** (2 * self.loss1 / 20)
+            factor21 *= 10 ** ((self.loss1 + self.loss2) / 20)
+        return factor11, factor21
+
+
+class CalDataSet:
+    """Calibration data stored column wise.
+
+    One sorted frequency array plus one complex array per standard and per
+    error term. A missing standard at a frequency is stored as zero.
+
+    Rows are still read and written as CalData by frequency, like the dict
+    this used to be. The dict itself, `data`, is gone: use the columns, or
+    items() and values().
+    """
+
     def __init__(self):
-        super().__init__()
         self.notes = ""
-        self.data: defaultdict[int, CalData] = defaultdict(CalData)
+        self.clear()
 
     def __str__(self):
+        if not self.complete1port():
+            return ""
+        columns = [self.freq.tolist()] + [
+            self.standards[name].tolist() for name in STANDARDS
+        ]
         return (
-            (
-                "# Calibration data for pynanovna\n"
-                + "\n".join([f"! {note}" for note in self.notes.splitlines()])
-                + "\n"
-                + "# Hz ShortR ShortI OpenR OpenI LoadR LoadI"
-                + (
-                    " ThroughR ThroughI ThrureflR" " ThrureflI IsolationR IsolationI\n"
-                    if self.complete2port()
-                    else "\n"
-                )
-                + "\n".join([f"{self.data.get(freq)}" for freq in self.frequencies()])
-                + "\n"
+            "# Calibration data for pynanovna\n"
+            + "\n".join([f"! {note}" for note in self.notes.splitlines()])
+            + "\n"
+            + "# Hz ShortR ShortI OpenR OpenI LoadR LoadI"
+            + (
+                " ThroughR ThroughI ThrureflR" " ThrureflI IsolationR IsolationI\n"
+                if self.complete2port()
+                else "\n"
+            )
+            + "\n".join(
+                [
+                    f"{freq}"
+                    f" {short.real} {short.imag}"
+                    f" {open_.real} {open_.imag}"
+                    f" {load.real} {load.imag}"
+                    + (
+                        f" {through.real} {through.imag}"
+                        f" {thrurefl.real} {thrurefl.imag}"
+                        f" {isolation.real} {isolation.imag}"
+                        if through
+                        else ""
+                    )
+                    for freq, short, open_, load, through, thrurefl, isolation in zip(
+                        *columns
+                    )
+                ]
             )
-            if self.complete1port()
-            else ""
+            + "\n"
         )
 
+    def __len__(self) -> int:
+        return len(self.freq)
+
+    def __iter__(self):
+        yield from self.freq.tolist()
+
+    def __contains__(self, key: int) -> bool:
+        i = np.searchsorted(self.freq, key)
+        return bool(i < len(self.freq) and self.freq[i] == key)
+
+    def __getitem__(self, key: int) -> CalData:
+        if (caldata := self.get(key)) is None:
+            raise KeyError(key)
+        return caldata
+
+    def __setitem__(self, key: int, value: CalData):
+        for name in STANDARDS:
+            self.insert(name, getattr(value, name), key)
+        i = np.searchsorted(self.freq, key)
+        for name in ERROR_TERMS:
+            self.terms[name][i] = getattr(value, name)
+
+    def clear(self):
+        """Remove all data points."""
+        self.freq = np.array([], dtype=np.int64)
+        self.standards = {
+            name: np.array([], dtype=np.complex128) for name in STANDARDS
+        }
+        self.terms = {name: np.array([], dtype=np.complex128) for name in ERROR_TERMS}
+
     def _append_match(self, m: re.Match, header: str, line_nr: int, line: str) -> None:
         cal = m.groupdict()
         columns = {col[:-1] for col in cal.keys() if cal[col] and col != "freq"}
@@ -162,17 +268,71 @@ class CalDataSet(UserDict):
             cal["isolationr"] = cal["thrureflr"]
             cal["isolationi"] = cal["thrurefli"]
             cal["thrureflr"], cal["thrurefli"] = None, None
+            columns = (columns - {"thrurefl"}) | {"isolation"}
         for name in columns:
-            self.insert(
-                name,
-                complex(float(cal[f"{name}r"]), float(cal[f"{name}i"])),
-                int(cal["freq"]),
+            values, frequencies = self._pending[name]
+            values.append(complex(float(cal[f"{name}r"]), float(cal[f"{name}i"])))
+            frequencies.append(int(cal["freq"]))
+
+    def _from_str_bulk(self, text: str) -> bool:
+        """Parse well formed cal data in one vectorized call.
+
+        Accepts only what the line by line parser accepts: the frequency is
+        read as integer and the values may only use the characters of
+        RXP_CAL_LINE. At 10000 points this is only about 6 times as fast
+        as the line by line parser, not 10: half of the time is the number
+        conversion in loadtxt, most of the rest splitting the lines. Passing
+        the text to loadtxt with comments= measured slower than the list.
+
+        Returns:
+            bool: False if the text has to go through the line by line parser.
+        """
+        header = ""
+        comments, lines = [], []
+        for line in text.splitlines():
+            line = line.strip()
+            (comments if line[:1] in ("!", "#") else lines).append(line)
+        for comment in comments:
+            if comment.startswith("!"):
+                self.notes += f"{comment[2:]}\n"
+                continue
+            if m := RXP_CAL_HEADER.search(comment):
+                if header:
+                    return False
+                header = "through" if m.group("through") else "sol"
+        # loadtxt warns about input without data
+        if not header or not (first := next(filter(None, lines), None)):
+            return False
+        names = CAL_COLUMNS.get(len(first.split()), ())
+        if not names or (header == "sol" and len(names) > 3):
+            return False
+        try:
+            if "\n".join(lines).encode("ascii").translate(None, CAL_DATA_CHARS):
+                return False
+            table = np.loadtxt(
+                lines,
+                dtype=[("freq", np.int64), ("values", np.float64, (2 * len(names),))],
+                comments=None,
+                ndmin=1,
             )
+        except ValueError:
+            return False
+        freq, values = table["freq"], table["values"]
+        if (freq < 0).any():
+            return False
+        for i, name in enumerate(names):
+            self.insert_many(name, values[:, 2 * i] + 1j * values[:, 2 * i + 1], freq)
+        return True
 
     def from_str(self, text: str) -> "CalDataSet":
         # reset data
         self.notes = ""
-        self.data = defaultdict(CalData)
+        self.clear()
+        if self._from_str_bulk(text):
+            return self
+        self.notes = ""
+        self.clear()
+        self._pending = {name: ([], []) for name in STANDARDS}
         header = ""
         # parse text
         for i, line in enumerate(text.splitlines(), 1):
@@ -195,7 +355,11 @@ class CalDataSet(UserDict):
                 continue
             if not header:
                 logger.warning("Caldata without having read header: %i: %s", i, line)
-            self._append_match(m, header, line, i)
+            self._append_match(m, header, i, line)
+        for name, (values, frequencies) in self._pending.items():
+            if values:
+                self.insert_many(name, values, frequencies)
+        del self._pending
         return self
 
     def insert(self, name: str, datapoint: complex, frequency: int):
@@ -216,47 +380,79 @@ class CalDataSet(UserDict):
         Raises:
             KeyError: If the name is not valid.
         """
-        if name not in {
-            "short",
-            "open",
-            "load",
-            "through",
-            "thrurefl",
-            "isolation",
-        }:
-            raise KeyError(name)
-        setattr(self.data[frequency], name, (datapoint))
-        self.data[frequency].freq = frequency
+        self.insert_many(name, [datapoint], [frequency])
+
+    def insert_many(self, name: str, data: np.array, frequencies: np.array):
+        """Insert a whole sweep of datapoints in the dataset.
 
-    def frequencies(self) -> list[int]:
-        return sorted(self.data.keys())
+        Args:
+            name (str): Name of dataset, see `insert`.
+            data (np.array): The datapoints to insert.
+            frequencies (np.array): The frequencies of the datapoints.
+
+        Raises:
+            KeyError: If the name is not valid.
+        """
+        if name not in STANDARDS:
+            raise KeyError(name)
+        frequencies = np.asarray(frequencies, dtype=np.int64)
+        if np.array_equal(frequencies, self.freq):
+            self.standards[name][:] = data
+            return
+        new = np.setdiff1d(frequencies, self.freq)
+        if new.size:
+            freq = np.union1d(self.freq, new)
+            old = np.searchsorted(freq, self.freq)
+            for columns in (self.standards, self.terms):
+                for key, values in columns.items():
+                    columns[key] = np.zeros(len(freq), dtype=np.complex128)
+                    columns[key][old] = values
+            self.freq = freq
+        self.standards[name][np.searchsorted(self.freq, frequencies)] = data
+
+    def frequencies(self) -> np.ndarray:
+        """The frequencies as a read-only view, insert to add some."""
+        frequencies = self.freq.view()
+        frequencies.flags.writeable = False
+        return frequencies
+
+    def keys(self) -> list[int]:
+        return self.freq.tolist()
 
     def get(self, key: int, default: CalData = None) -> CalData:
-        return self.data.get(key, default)
+        i = np.searchsorted(self.freq, key)
+        if i == len(self.freq) or self.freq[i] != key:
+            return default
+        return self._row(i)
+
+    def _row(self, i: int) -> CalData:
+        return CalData(
+            freq=int(self.freq[i]),
+            **{name: complex(self.standards[name][i]) for name in STANDARDS},
+            **{name: complex(self.terms[name][i]) for name in ERROR_TERMS},
+        )
 
     def items(self):
-        yield from self.data.items()
+        for i, freq in enumerate(self.freq.tolist()):
+            yield freq, self._row(i)
 
     def values(self):
-        for freq in self.frequencies():
-            yield self.get(freq)
+        for i in range(len(self.freq)):
+            yield self._row(i)
 
     def size_of(self, name: str) -> int:
-        return len([True for val in self.data.values() if getattr(val, name)])
+        return int(np.count_nonzero(self.standards[name]))
+
+    def _complete(self, names: tuple[str, ...]) -> bool:
+        return len(self.freq) > 0 and all(
+            np.all(self.standards[name]) for name in names
+        )
 
     def complete1port(self) -> bool:
-        for val in self.data.values():
-            if not all((val.short, val.open, val.load)):
-                return False
-        return any(self.data)
+        return self._complete(("short", "open", "load"))
 
     def complete2port(self) -> bool:
-        if not self.complete1port():
-            return False
-        for val in self.data.values():
-            if not all((val.through, val.thrurefl, val.isolation)):
-                return False
-        return any(self.data)
+        return self._complete(STANDARDS)
 
 
 class Calibration:
@@ -265,10 +461,24 @@ class Calibration:
         self.dataset = CalDataSet()
         self.cal_element = CalElement()
         self.interp = {}
+        self.terms = {}
+        self.terms_freq = np.array([], dtype=np.float64)
         self.isCalculated = False
+        self.port_extension = PortExtension()
+        self._cache_grid = None
+        self._cache = {}
+        self._rotation_grid = None
+        self._rotation = ()
+        self._version = 0
+        self._valid_1_port = False
+        self._valid_2_port = False
 
         self.source = "Manual"
 
+    def copy(self) -> "Calibration":
+        """Get an independent copy, changing it leaves this calibration as is."""
+        return copy.deepcopy(self)
+
     def calibration_step(
         self, name: str, s11: np.array, s21: np.array, frequencies: np.array
     ):
@@ -286,11 +496,97 @@ class Calibration:
             self.insert(name, s11, frequencies)
 
     def insert(self, name: str, data: np.array, frequencies: np.array):
-        for datapoint, frequency in zip(data, frequencies):
-            self.dataset.insert(name, datapoint, frequency)
+        self.dataset.insert_many(name, data, frequencies)
+        self.update_state()
+
+    @property
+    def offset_delay(self) -> float:
+        return self.port_extension.delay1
+
+    def set_offset_delay(self, delay: float):
+        """Set the offset delay applied after the calibration.
+
+        This is a port extension of `delay` on port 1 and none on port 2.
+
+        Args:
+            delay (float): The delay in seconds.
+        """
+        self.use_port_extension(PortExtension(delay1=delay))
+
+    def set_port_extension(self, port: int, delay: float, loss: float = 0.0):
+        """Set the port extension of one port.
+
+        Args:
+            port (int): 1 or 2.
+            delay (float): One way delay in seconds.
+            loss (float): One way loss in dB. Defaults to 0.
+
+        Raises:
+            ValueError: If the port is not 1 or 2.
+        """
+        if port not in (1, 2):
+            raise ValueError(f"No port {port}, must be 1 or 2.")
+        self.use_port_extension(
+            replace(self.port_extension, **{f"delay{port}": delay, f"loss{port}": loss})
+        )
+
+    def use_port_extension(self, port_extension: PortExtension):
+        """Replace the port extension, keeping the cached error terms.
+
+        Args:
+            port_extension (PortExtension): The new port extension.
+        """
+        self.port_extension = replace(port_extension)
+        self._rotation_grid = None
+        self._rotation = ()
+        self._version += 1
+
+    @property
+    def version(self) -> int:
+        """Counter that increases every time the calibration changes."""
+        return self._version
+
+    def update_state(self):
+        """Re-check the validity of the dataset and invalidate the cache.
+
+        Call this after modifying `dataset` directly.
+        """
+        self._valid_1_port = self.dataset.complete1port()
+        self._valid_2_port = self.dataset.complete2port()
+        self.invalidate_cache()
+
+    def invalidate_cache(self):
+        """Drop the error terms cached for the last frequency grid."""
+        self._cache_grid = None
+        self._cache = {}
+        self._rotation_grid = None
+        self._rotation = ()
+        self._version += 1
+
+    def prepare(self, frequencies: np.array) -> dict[str, np.ndarray]:
+        """Resample the error terms onto a frequency grid and cache them.
+
+        The cache is keyed by the grid, so repeated sweeps over the same
+        frequencies only do elementwise math in `apply`.
+
+        Args:
+            frequencies (np.array): Frequencies of the sweep.
+
+        Returns:
+            dict: Error term name to complex array on the grid.
+        """
+        grid = self._cache_grid
+        if grid is not None and np.array_equal(frequencies, grid):
+            return self._cache
+        frequencies = np.array(frequencies, dtype=np.float64)
+        cache = self.interp_terms(frequencies) if self.isCalculated else {}
+        self._cache_grid = frequencies
+        self._cache = cache
+        logger.debug("Cached error terms for %d points.", len(frequencies))
+        return cache
 
     def size(self) -> int:
-        return len(self.dataset.frequencies())
+        return len(self.dataset)
 
     def data_size(self, name) -> int:
         return self.dataset.size_of(name)
@@ -301,7 +597,7 @@ class Calibration:
         Returns:
             bool: If the port is calibrated.
         """
-        return self.dataset.complete1port()
+        return self._valid_1_port
 
     def is_valid_2_port(self) -> bool:
         """Check if the port has been calibrated.
@@ -309,16 +605,29 @@ class Calibration:
         Returns:
             bool: If the port is calibrated.
         """
-        return self.dataset.complete2port()
+        return self._valid_2_port
+
+    @staticmethod
+    def _check_denominator(denominator: np.ndarray, freq: np.ndarray, what: str):
+        if not (bad := denominator == 0).any():
+            return
+        logger.error(
+            "Division error - did you use the same measurement"
+            " for two of short, open and load?"
+        )
+        raise ValueError(
+            f"{what} at {np.count_nonzero(bad)} frequencies:"
+            f" {', '.join(f'{f}Hz' for f in freq[bad].tolist())}."
+        )
 
-    def _calc_port_1(self, freq: int, cal: CalData):
+    def _calc_port_1(self, freq: np.ndarray, standards: dict[str, np.ndarray]):
         g1 = self.gamma_short(freq)
         g2 = self.gamma_open(freq)
         g3 = self.gamma_load(freq)
 
-        gm1 = cal.short
-        gm2 = cal.open
-        gm3 = cal.load
+        gm1 = standards["short"]
+        gm2 = standards["open"]
+        gm3 = standards["load"]
 
         denominator = (
             g1 * (g2 - g3) * gm1
@@ -326,38 +635,53 @@ class Calibration:
             - g2 * g3 * gm3
             - (g2 * gm2 - g3 * gm3) * g1
         )
-        cal.e00 = (
+        self._check_denominator(
+            denominator, freq, "Two of short, open and load returned the same values"
+        )
+        e00 = (
             -(
                 (g2 * gm3 - g3 * gm3) * g1 * gm2
                 - (g2 * g3 * gm2 - g2 * g3 * gm3 - (g3 * gm2 - g2 * gm3) * g1) * gm1
             )
             / denominator
         )
-        cal.e11 = (
-            (g2 - g3) * gm1 - g1 * (gm2 - gm3) + g3 * gm2 - g2 * gm3
-        ) / denominator
-        cal.delta_e = (
+        e11 = ((g2 - g3) * gm1 - g1 * (gm2 - gm3) + g3 * gm2 - g2 * gm3) / denominator
+        delta_e = (
             -(
                 (g1 * (gm2 - gm3) - g2 * gm2 + g3 * gm3) * gm1
                 + (g2 * gm3 - g3 * gm3) * gm2
             )
             / denominator
         )
-
-    def _calc_port_2(self, freq: int, cal: CalData):
+        return e00, e11, delta_e
+
+    def _calc_port_2(
+        self,
+        freq: np.ndarray,
+        standards: dict[str, np.ndarray],
+        e00: np.ndarray,
+        e11: np.ndarray,
+        delta_e: np.ndarray,
+    ):
         gt = self.gamma_through(freq)
 
-        gm4 = cal.through
-        gm5 = cal.thrurefl
-        gm6 = cal.isolation
-        gm7 = gm5 - cal.e00
+        gm4 = standards["through"]
+        gm5 = standards["thrurefl"]
+        gm6 = standards["isolation"]
+        gm7 = gm5 - e00
 
-        cal.e30 = cal.isolation
-        cal.e10e01 = cal.e00 * cal.e11 - cal.delta_e
-        cal.e22 = gm7 / (gm7 * cal.e11 * gt**2 + cal.e10e01 * gt**2)
-        cal.e10e32 = (gm4 - gm6) * (1 - cal.e11 * cal.e22 * gt**2) / gt
+        e30 = gm6.copy()
+        e10e01 = e00 * e11 - delta_e
+        denominator = gm7 * e11 * gt**2 + e10e01 * gt**2
+        self._check_denominator(
+            denominator, freq, "Through reflection equals the directivity"
+        )
+        e22 = gm7 / denominator
+        e10e32 = (gm4 - gm6) * (1 - e11 * e22 * gt**2) / gt
+        return e10e01, e30, e22, e10e32
 
     def calc_corrections(self):
+        self.update_state()
         if not self.is_valid_1_port():
             logger.warning("Tried to calibrate from insufficient data.")
             raise ValueError(
@@ -366,34 +690,34 @@ class Calibration:
             )
         logger.debug("Calculating calibration for %d points.", self.size())
 
-        for freq, caldata in self.dataset.items():
-            try:
-                self._calc_port_1(freq, caldata)
-                if self.is_valid_2_port():
-                    self._calc_port_2(freq, caldata)
-            except ZeroDivisionError as exc:
-                self.isCalculated = False
-                logger.error(
-                    "Division error - did you use the same measurement"
-                    " for two of short, open and load?"
+        freq = self.dataset.freq
+        standards = self.dataset.standards
+        terms = self.dataset.terms
+        try:
+            e00, e11, delta_e = self._calc_port_1(freq, standards)
+            terms.update(e00=e00, e11=e11, delta_e=delta_e)
+            if self.is_valid_2_port():
+                e10e01, e30, e22, e10e32 = self._calc_port_2(
+                    freq, standards, e00, e11, delta_e
                 )
-                raise ValueError(
-                    f"Two of short, open and load returned the same"
-                    f" values at frequency {freq}Hz."
-                ) from exc
+                terms.update(e10e01=e10e01, e30=e30, e22=e22, e10e32=e10e32)
+        except ValueError:
+            self.isCalculated = False
+            raise
 
         self.gen_interpolation()
         self.isCalculated = True
         logger.debug("Calibration correctly calculated.")
 
-    def gamma_short(self, freq: int) -> complex:
+    def gamma_short(self, freq: np.ndarray) -> np.ndarray:
+        freq = np.asarray(freq, dtype=np.float64)
         if self.cal_element.short_is_ideal:
-            return IDEAL_SHORT
+            return np.full(freq.shape, IDEAL_SHORT)
         logger.debug("Using short calibration set values.")
         cal_element = self.cal_element
-        Zsp = complex(
-            0.0,
-            2.0
+        Zsp = (
+            1j
+            * 2.0
             * math.pi
             * freq
             * (
@@ -401,23 +725,24 @@ class Calibration:
                 + cal_element.short_l1 * freq
                 + cal_element.short_l2 * freq**2
                 + cal_element.short_l3 * freq**3
-            ),
+            )
         )
         # Referencing https://arxiv.org/pdf/1606.02446.pdf (18) - (21)
         return (
             (Zsp / 50.0 - 1.0)
             / (Zsp / 50.0 + 1.0)
-            * cmath.exp(complex(0.0, -4.0 * math.pi * freq * cal_element.short_length))
+            * np.exp(-4j * math.pi * freq * cal_element.short_length)
         )
 
-    def gamma_open(self, freq: int) -> complex:
+    def gamma_open(self, freq: np.ndarray) -> np.ndarray:
+        freq = np.asarray(freq, dtype=np.float64)
         if self.cal_element.open_is_ideal:
-            return IDEAL_OPEN
+            return np.full(freq.shape, IDEAL_OPEN)
         logger.debug("Using open calibration set values.")
         cal_element = self.cal_element
-        Zop = complex(
-            0.0,
-            2.0
+        Zop = (
+            1j
+            * 2.0
             * math.pi
             * freq
             * (
@@ -425,109 +750,174 @@ class Calibration:
                 + cal_element.open_c1 * freq
                 + cal_element.open_c2 * freq**2
                 + cal_element.open_c3 * freq**3
-            ),
+            )
         )
-        return ((1.0 - 50.0 * Zop) / (1.0 + 50.0 * Zop)) * cmath.exp(
-            complex(0.0, -4.0 * math.pi * freq * cal_element.open_length)
+        return ((1.0 - 50.0 * Zop) / (1.0 + 50.0 * Zop)) * np.exp(
+            -4j * math.pi * freq * cal_element.open_length
         )
 
-    def gamma_load(self, freq: int) -> complex:
+    def gamma_load(self, freq: np.ndarray) -> np.ndarray:
+        freq = np.asarray(freq, dtype=np.float64)
         if self.cal_element.load_is_ideal:
-            return IDEAL_LOAD
+            return np.full(freq.shape, IDEAL_LOAD)
         logger.debug("Using load calibration set values.")
         cal_element = self.cal_element
-        Zl = complex(cal_element.load_r, 0.0)
+        Zl = np.full(freq.shape, complex(cal_element.load_r, 0.0))
         if cal_element.load_c > 0.0:
-            Zl = cal_element.load_r / complex(
-                1.0,
-                2.0 * cal_element.load_r * math.pi * freq * cal_element.load_c,
+            Zl = cal_element.load_r / (
+                1.0 + 2j * cal_element.load_r * math.pi * freq * cal_element.load_c
             )
         if cal_element.load_l > 0.0:
-            Zl = Zl + complex(0.0, 2 * math.pi * freq * cal_element.load_l)
+            Zl = Zl + 2j * math.pi * freq * cal_element.load_l
         return (
             (Zl / 50.0 - 1.0)
             / (Zl / 50.0 + 1.0)
-            * cmath.exp(complex(0.0, -4 * math.pi * freq * cal_element.load_length))
+            * np.exp(-4j * math.pi * freq * cal_element.load_length)
         )
 
-    def gamma_through(self, freq: int) -> complex:
+    def gamma_through(self, freq: np.ndarray) -> np.ndarray:
+        freq = np.asarray(freq, dtype=np.float64)
         if self.cal_element.through_is_ideal:
-            return IDEAL_THROUGH
+            return np.full(freq.shape, IDEAL_THROUGH)
         logger.debug("Using through calibration set values.")
-        cal_element = self.cal_element
-        return cmath.exp(
-            complex(0.0, -2.0 * math.pi * cal_element.through_length * freq)
-        )
+        return np.exp(-2j * math.pi * self.cal_element.through_length * freq)
 
     def gen_interpolation(self):
-        (freq, e00, e11, delta_e, e10e01, e30, e22, e10e32) = zip(
-            *[
-                (
-                    c.freq,
-                    c.e00,
-                    c.e11,
-                    c.delta_e,
-                    c.e10e01,
-                    c.e30,
-                    c.e22,
-                    c.e10e32,
-                )
-                for c in self.dataset.values()
-            ]
-        )
+        self.terms = {name: self.dataset.terms[name].copy() for name in ERROR_TERMS}
+        self.terms_freq = self.dataset.freq.astype(np.float64)
+        freq = self.terms_freq
 
         self.interp = {
-            "e00": interp1d(
+            name: interp1d(
                 freq,
-                e00,
+                values,
                 kind="slinear",
                 bounds_error=False,
-                fill_value=(e00[0], e00[-1]),
-            ),
-            "e11": interp1d(
-                freq,
-                e11,
-                kind="slinear",
-                bounds_error=False,
-                fill_value=(e11[0], e11[-1]),
-            ),
-            "delta_e": interp1d(
-                freq,
-                delta_e,
-                kind="slinear",
-                bounds_error=False,
-                fill_value=(delta_e[0], delta_e[-1]),
-            ),
-            "e10e01": interp1d(
-                freq,
-                e10e01,
-                kind="slinear",
-                bounds_error=False,
-                fill_value=(e10e01[0], e10e01[-1]),
-            ),
-            "e30": interp1d(
-                freq,
-                e30,
-                kind="slinear",
-                bounds_error=False,
-                fill_value=(e30[0], e30[-1]),
-            ),
-            "e22": interp1d(
-                freq,
-                e22,
-                kind="slinear",
-                bounds_error=False,
-                fill_value=(e22[0], e22[-1]),
-            ),
-            "e10e32": interp1d(
-                freq,
-                e10e32,
-                kind="slinear",
-                bounds_error=False,
-                fill_value=(e10e32[0], e10e32[-1]),
-            ),
+                fill_value=(values[0], values[-1]),
+            )
+            for name, values in self.terms.items()
         }
 
+    def interp_terms(self, frequencies: np.array) -> dict[str, np.ndarray]:
+        """Interpolate all error terms onto a frequency grid.
+
+        Linear interpolation with the edge values held outside the calibrated
+        range, same as the interpolators in `interp`.
+
+        Args:
+            frequencies (np.array): Frequencies to interpolate to.
+
+        Returns:
+            dict: Error term name to complex array.
+        """
+        frequencies = np.asarray(frequencies, dtype=np.float64)
+        xp = self.terms_freq
+        return {
+            name: np.interp(frequencies, xp, values.real)
+            + 1j * np.interp(frequencies, xp, values.imag)
+            for name, values in self.terms.items()
+        }
+
+    def apply(
+        self,
+        raw_s11: np.array,
+        raw_s21: np.array,
+        frequencies: np.array,
+        out: tuple[np.ndarray, np.ndarray] = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Apply the calibration to a whole sweep at once.
+
+        S21 is only corrected if a 2 port calibration is available,
+        otherwise a copy of the raw data is returned.
+
+        Args:
+            raw_s11 (np.array): Raw s11 data.
+            raw_s21 (np.array): Raw s21 data.
+            frequencies (np.array): Frequencies of the sweep.
+            out (tuple): complex128 arrays to write s11 and s21 into, they
+                may be the raw arrays. Defaults to new arrays.
+
+        Raises:
+            ValueError: If no calibration has been calculated.
+
+        Returns:
+            tuple: Calibrated s11 and s21 as complex arrays.
+        """
+        if not self.isCalculated:
+            raise ValueError("No calibration has been calculated.")
+        raw_s11 = np.asarray(raw_s11, dtype=np.complex128)
+        raw_s21 = np.asarray(raw_s21, dtype=np.complex128)
+        if out is None:
+            out = (np.empty_like(raw_s11), np.empty_like(raw_s21))
+        s11, s21 = out
+        t = self.prepare(frequencies)
+
+        denominator = raw_s11 * t["e11"]
+        denominator -= t["delta_e"]
+        if self.is_valid_2_port():
+            np.subtract(raw_s21, t["e30"], out=s21)
+            s21 /= t["e10e32"]
+            s21 *= t["e10e01"]
+            s21 /= denominator
+        else:
+            np.copyto(s21, raw_s21)
+        np.subtract(raw_s11, t["e00"], out=s11)
+        s11 /= denominator
+        return s11, s21
+
+    def apply_port_extension(
+        self,
+        s11: np.array,
+        s21: np.array,
+        frequencies: np.array,
+        out: tuple[np.ndarray, np.ndarray] = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Apply the port extension to a whole sweep.
+
+        The compensation factors are cached for the frequency grid, and only
+        rebuilt when the grid or the port extension changes.
+
+        Args:
+            s11 (np.array): s11 data.
+            s21 (np.array): s21 data.
+            frequencies (np.array): Frequencies of the sweep.
+            out (tuple): complex128 arrays to write s11 and s21 into, they
+                may be the input arrays. Defaults to new arrays, or to the
+                input arrays when no port extension is set.
+
+        Returns:
+            tuple: Compensated s11 and s21 as complex arrays.
+        """
+        if not self.port_extension.is_active():
+            if out is None:
+                return s11, s21
+            np.copyto(out[0], s11)
+            np.copyto(out[1], s21)
+            return out
+        factor11, factor21 = self.port_extension_factors(frequencies)
+        if out is None:
+            return s11 * factor11, s21 * factor21
+        np.multiply(s11, factor11, out=out[0])
+        np.multiply(s21, factor21, out=out[1])
+        return out
+
+    def port_extension_factors(
+        self, frequencies: np.array
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Get the port extension factors for a grid, cached per grid.
+
+        Args:
+            frequencies (np.array): Frequencies of the sweep.
+
+        Returns:
+            tuple: s11 and s21 factors as complex arrays.
+        """
+        grid = self._rotation_grid
+        if grid is None or not np.array_equal(frequencies, grid):
+            self._rotation_grid = np.array(frequencies, dtype=np.float64)
+            self._rotation = self.port_extension.factors(self._rotation_grid)
+        return self._rotation
+
     def correct11(self, datapoint: complex, frequency):
         i = self.interp
         s11 = (datapoint - i["e00"](frequency)) / (
@@ -544,15 +934,96 @@ class Calibration:
         )
         return s21
 
-    def save(self, filename: str):
+    def save(self, filename: str, terms: bool = True):
+        """Save the calibration.
+
+        Filenames ending with `.npz` are saved in the binary format, anything
+        else as a text `.cal` file.
+
+        Args:
+            filename (str): The file to save to.
+            terms (bool): Also store the solved error terms in a binary file,
+                so loading it does not need to recalculate. Defaults to True.
+
+        Raises:
+            ValueError: If the calibration is not valid.
+        """
         self.dataset.notes = "\n".join(self.notes)
         if not self.is_valid_1_port():
             raise ValueError("Not a valid calibration")
+        if filename.lower().endswith(".npz"):
+            self._save_npz(filename, terms and self.isCalculated)
+            return
         with open(filename, mode="w", encoding="utf-8") as calfile:
             calfile.write(str(self.dataset))
 
+    def _save_npz(self, filename: str, terms: bool):
+        arrays = {
+            "format": np.array(CAL_NPZ_FORMAT),
+            "notes": np.array(self.dataset.notes),
+            "freq": self.dataset.freq,
+            **self.dataset.standards,
+            **{
+                f"element_{name}": np.array(value)
+                for name, value in asdict(self.cal_element).items()
+            },
+        }
+        if terms:
+            arrays.update(self.dataset.terms)
+        with open(filename, mode="wb") as calfile:
+            np.savez(calfile, **arrays)
+
     def load(self, filename):
+        """Load a calibration from a text `.cal` or a binary `.npz` file.
+
+        The format is detected from the file content. A binary file holding
+        solved error terms is ready to use without `calc_corrections`.
+
+        Args:
+            filename (str): The file to load.
+        """
         self.source = os.path.basename(filename)
+        with open(filename, mode="rb") as calfile:
+            binary = calfile.read(4) == NPZ_MAGIC
+        self.isCalculated = False
+        if binary:
+            self._load_npz(filename)
+            return
         with open(filename, encoding="utf-8") as calfile:
             self.dataset = CalDataSet().from_str(calfile.read())
             self.notes = self.dataset.notes.splitlines()
+        self.update_state()
+
+    def _load_npz(self, filename: str):
+        with np.load(filename, allow_pickle=False) as npz:
+            if int(npz["format"]) > CAL_NPZ_FORMAT:
+                raise ValueError(f"Unsupported calibration format in {filename}")
+            dataset = CalDataSet()
+            dataset.notes = str(npz["notes"])
+            dataset.freq = npz["freq"].astype(np.int64)
+            dataset.standards = {
+                name: npz[name].astype(np.complex128) for name in STANDARDS
+            }
+            has_terms = all(name in npz for name in ERROR_TERMS)
+            if has_terms:
+                dataset.terms = {
+                    name: npz[name].astype(np.complex128) for name in ERROR_TERMS
+                }
+            else:
+                dataset.terms = {
+                    name: np.zeros(len(dataset.freq), dtype=np.complex128)
+                    for name in ERROR_TERMS
+                }
+            self.cal_element = CalElement(
+                **{
+                    field.name: npz[f"element_{field.name}"].item()
+                    for field in fields(CalElement)
+                    if f"element_{field.name}" in npz
+                }
+            )
+        self.dataset = dataset
+        self.notes = dataset.notes.splitlines()
+        self.update_state()
+        if has_terms and self.is_valid_1_port():
+            self.gen_interpolation()
+            self.isCalculated = True
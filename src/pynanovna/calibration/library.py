@@ -0,0 +1,163 @@
+import logging
+import os
+import re
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from .calibration import NPZ_MAGIC, CalDataSet, Calibration
+
+logger = logging.getLogger(__name__)
+
+CalibrationKey = namedtuple("CalibrationKey", "sn start stop points")
+
+RXP_SN_NOTE = re.compile(r"^SN: (?P<sn>.+)$", re.MULTILINE)
+
+CAL_EXTENSIONS = (".cal", ".npz")
+
+
+def calibration_key(dataset: CalDataSet, sn: str = None) -> CalibrationKey:
+    """Get the key a calibration dataset is indexed by.
+
+    Args:
+        dataset (CalDataSet): The calibration data.
+        sn (str): Serial number of the device. Defaults to the "SN: " note
+            of the dataset, or None if there is no such note.
+
+    Returns:
+        CalibrationKey: (sn, start, stop, points)
+    """
+    if sn is None and (m := RXP_SN_NOTE.search(dataset.notes)):
+        sn = m.group("sn").strip()
+    freq = dataset.freq
+    return CalibrationKey(sn, int(freq[0]), int(freq[-1]), len(freq))
+
+
+class CalibrationLibrary:
+    def __init__(self, directory: str, cache_size: int = 8):
+        """A directory of calibrations indexed by device and sweep plan.
+
+        Files are matched by the serial number in their "SN: " note and by
+        their start, stop and number of points. Files without a serial number
+        note match any device. Recently used calibrations are kept solved in
+        memory, so switching back to them needs no disk access.
+
+        Args:
+            directory (str): Directory with .cal and .npz calibration files.
+            cache_size (int): Number of calibrations kept in memory. Defaults to 8.
+        """
+        self.directory = directory
+        self.cache_size = cache_size
+        self.index: dict[CalibrationKey, str] = {}
+        self._cache: OrderedDict[str, Calibration] = OrderedDict()
+        self.refresh()
+
+    def refresh(self):
+        """Re-scan the directory for calibration files."""
+        self.index = {}
+        self._cache.clear()
+        for name in sorted(os.listdir(self.directory)):
+            if not name.lower().endswith(CAL_EXTENSIONS):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                key = self._read_key(path)
+            except Exception as e:
+                logger.warning("Skipping calibration file %s: %s", path, e)
+                continue
+            if key is None:
+                continue
+            if key in self.index:
+                logger.warning(
+                    "%s has the same key as %s, ignoring it.", path, self.index[key]
+                )
+                continue
+            self.index[key] = path
+        logger.debug("Indexed %d calibrations in %s", len(self.index), self.directory)
+
+    @staticmethod
+    def _read_key(path: str) -> CalibrationKey:
+        with open(path, mode="rb") as calfile:
+            binary = calfile.read(4) == NPZ_MAGIC
+        dataset = CalDataSet()
+        if binary:
+            with np.load(path, allow_pickle=False) as npz:
+                dataset.notes = str(npz["notes"])
+                dataset.freq = npz["freq"]
+        else:
+            with open(path, encoding="utf-8") as calfile:
+                dataset.from_str(calfile.read())
+        if not len(dataset):
+            return None
+        return calibration_key(dataset)
+
+    def find(self, sn: str, start: float, stop: float, points: int) -> str:
+        """Find the file matching a device and sweep plan.
+
+        Start and stop match within half a frequency step, since devices
+        round the requested frequencies.
+
+        Returns:
+            str: Path of the calibration file, or None if there is no match.
+        """
+        tolerance = (stop - start) / max(points - 1, 1) / 2
+        matches = [
+            (key.sn != sn, path)
+            for key, path in self.index.items()
+            if key.points == points
+            and key.sn in (sn, None)
+            and abs(key.start - start) <= tolerance
+            and abs(key.stop - stop) <= tolerance
+        ]
+        return min(matches)[1] if matches else None
+
+    def get(self, sn: str, start: float, stop: float, points: int) -> Calibration:
+        """Get the solved calibration for a device and sweep plan.
+
+        Returns:
+            Calibration: A copy of the calibration, changing it does not
+                change the library. None if there is no match.
+        """
+        if (path := self.find(sn, start, stop, points)) is None:
+            return None
+        if path in self._cache:
+            self._cache.move_to_end(path)
+            return self._cache[path].copy()
+        cal = Calibration()
+        cal.load(path)
+        if not cal.isCalculated:
+            cal.calc_corrections()
+        self._remember(path, cal)
+        return cal.copy()
+
+    def _remember(self, path: str, cal: Calibration):
+        self._cache[path] = cal
+        self._cache.move_to_end(path)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def add(self, cal: Calibration, sn: str, filename: str = None) -> str:
+        """Save a solved calibration into the library.
+
+        Args:
+            cal (Calibration): The calibration.
+            sn (str): Serial number of the device it belongs to.
+            filename (str): Name of the file in the directory. Defaults to
+                "<sn>_<start>_<stop>_<points>.npz".
+
+        Returns:
+            str: Path of the saved file.
+        """
+        cal.notes = [note for note in cal.notes if not RXP_SN_NOTE.match(note)]
+        cal.notes.append(f"SN: {sn}")
+        key = calibration_key(cal.dataset, sn)
+        if filename is None:
+            filename = f"{sn}_{key.start}_{key.stop}_{key.points}.npz"
+        path = os.path.join(self.directory, filename)
+        cal.save(path)
+        for old, old_path in list(self.index.items()):
+            if old_path == path:
+                del self.index[old]
+        self.index[key] = path
+        self._remember(path, cal.copy())
+        return path
@@ -20,6 +20,3 @@ class AVNA(VNABase):
     def reset_sweep(self, start: int, stop: int):
         list(self.exec_command(f"sweep {start} {stop} {self.datapoints}"))
         list(self.exec_command("resume"))
-
-    def set_sweep(self, start, stop):
-        list(self.exec_command(f"sweep {start} {stop} {self.datapoints}"))
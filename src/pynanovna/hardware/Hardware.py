@@ -78,13 +78,13 @@ def usb_typename(device: ListPortInfo) -> str:
     )
 
 
-def get_interfaces() -> list[Interface]:
-    """Get list of interfaces with VNAs connected.
+def get_ports() -> list[tuple[ListPortInfo, str]]:
+    """Get the serial ports of known USB device types, without opening them.
 
     Returns:
-        list[Interface]: List of different serial interfaces.
+        list[tuple[ListPortInfo, str]]: Port info and USB type name.
     """
-    interfaces = []
+    ports = []
     for d in list_ports.comports():
         if platform.system() == "Windows" and d.vid is None:
             d = _fix_v2_hwinfo(d)
@@ -97,6 +97,18 @@ def get_interfaces() -> list[Interface]:
             d.pid,
             d.device,
         )
+        ports.append((d, typename))
+    return ports
+
+
+def get_interfaces() -> list[Interface]:
+    """Get list of interfaces with VNAs connected.
+
+    Returns:
+        list[Interface]: List of different serial interfaces.
+    """
+    interfaces = []
+    for d, typename in get_ports():
         iface = Interface("serial", typename)
         iface.port = d.device
         interfaces.append(iface)
@@ -105,8 +117,17 @@ def get_interfaces() -> list[Interface]:
     return interfaces
 
 
-def get_VNA(iface: Interface) -> VNABase:
+def get_VNA(iface: Interface, variant: str = None) -> VNABase:
     # serial_port.timeout = TIMEOUT
+    if variant in NAME2DEVICE:
+        # known from discovery, but another device may be on the port now
+        try:
+            vna = NAME2DEVICE[variant](iface)
+            if is_variant(vna, variant):
+                return vna
+            logger.warning("%s is no longer a %s, probing again", iface, variant)
+        except Exception as e:
+            logger.warning("Could not open %s as %s: %s", iface, variant, e)
     try:
         return NAME2DEVICE[get_comment(iface)](iface)
     except Exception as e:
@@ -114,6 +135,19 @@ def get_VNA(iface: Interface) -> VNABase:
         return None
 
 
+def is_variant(vna: VNABase, variant: str) -> bool:
+    """Check a driver opened for a cached variant against its firmware info.
+
+    Opening a device with the driver of a similar one, e.g. an H4 as an H,
+    works without errors, so the info the driver read has to match too.
+    NanoVNA V2 devices do not understand the text protocol, and the
+    reverse, so their drivers fail to open other devices.
+    """
+    if variant == "S-A-A-2":
+        return True
+    return variant_from_info(vna.firmware_info or "") == variant
+
+
 def get_comment(iface: Interface) -> str:
     logger.debug("Finding correct VNA type...")
     with iface.lock:
@@ -123,7 +157,11 @@ def get_comment(iface: Interface) -> str:
         return "S-A-A-2"
 
     logger.info("Finding firmware variant...")
-    info = get_info(iface)
+    return variant_from_info(get_info(iface))
+
+
+def variant_from_info(info: str) -> str:
+    """Get the firmware variant, a key of NAME2DEVICE, from the info output."""
     for search, name in (
         ("AVNA + Teensy", "AVNA"),
         ("NanoVNA-H 4", "H4"),
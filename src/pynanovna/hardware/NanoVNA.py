@@ -1,14 +1,105 @@
 import logging
 import struct
+from time import monotonic
+from typing import Generator
 
 import numpy as np
 
-from .Serial import drain_serial, Interface
-from .VNABase import VNABase
+from .Serial import (
+    PROMPT,
+    ClearInput,
+    Interface,
+    ReadExact,
+    SkipUntil,
+    Write,
+    drain_serial,
+)
+from .VNABase import VNABase, _command_timeout, parse_table
 from .Version import Version
 
 logger = logging.getLogger(__name__)
 
+SCAN_MASK_FREQUENCY = 0b001
+SCAN_MASK_S11 = 0b010
+SCAN_MASK_S21 = 0b100
+SCAN_MASK_BINARY = 0b10000000
+
+
+def parse_scan(raw: bytes, mask: int) -> tuple:
+    """Parse the output of "scan start stop points mask" in one call.
+
+    Each line holds the frequency if bit 0 of the mask is set, followed by
+    the real and imaginary part of s11 (bit 1) and of s21 (bit 2).
+
+    Args:
+        raw (bytes): Output of the scan command, as returned by exec_raw.
+        mask (int): The scan mask.
+
+    Returns:
+        tuple: frequencies as int64 array, s11 and s21 as complex128 arrays.
+            Values not selected by the mask are None.
+    """
+    columns = (
+        bool(mask & SCAN_MASK_FREQUENCY)
+        + 2 * bool(mask & SCAN_MASK_S11)
+        + 2 * bool(mask & SCAN_MASK_S21)
+    )
+    values = parse_table(raw, columns)
+    result = []
+    col = 0
+    if mask & SCAN_MASK_FREQUENCY:
+        result.append(values[:, 0].astype(np.int64))
+        col = 1
+    else:
+        result.append(None)
+    for bit in (SCAN_MASK_S11, SCAN_MASK_S21):
+        if mask & bit:
+            result.append(values[:, col] + 1j * values[:, col + 1])
+            col += 2
+        else:
+            result.append(None)
+    return tuple(result)
+
+
+def scan_record(mask: int) -> np.dtype:
+    """Get the dtype of one point of a binary scan.
+
+    Each point holds the frequency as uint32 if bit 0 of the mask is set,
+    followed by s11 (bit 1) and s21 (bit 2) as pairs of float32.
+    """
+    fields = [
+        (name, fmt)
+        for bit, name, fmt in (
+            (SCAN_MASK_FREQUENCY, "frequency", "<u4"),
+            (SCAN_MASK_S11, "s11", "<c8"),
+            (SCAN_MASK_S21, "s21", "<c8"),
+        )
+        if mask & bit
+    ]
+    return np.dtype(fields)
+
+
+def decode_scan(header: bytes, data: bytes) -> tuple:
+    """Decode the output of a binary scan.
+
+    Args:
+        header (bytes): The 4 byte header, the mask and the number of points
+            as uint16.
+        data (bytes): The points following the header.
+
+    Returns:
+        tuple: frequencies as int64 array, s11 and s21 as complex128 arrays.
+            Values not selected by the mask are None.
+    """
+    mask, points = struct.unpack("<HH", header)
+    records = np.frombuffer(data, dtype=scan_record(mask), count=points)
+    names = records.dtype.names
+    return (
+        records["frequency"].astype(np.int64) if "frequency" in names else None,
+        records["s11"].astype(np.complex128) if "s11" in names else None,
+        records["s21"].astype(np.complex128) if "s21" in names else None,
+    )
+
 
 class NanoVNA(VNABase):
     name = "NanoVNA"
@@ -16,13 +107,13 @@ class NanoVNA(VNABase):
     screenheight = 240
 
     def __init__(self, iface: Interface):
-        super().__init__(iface)
+        # read_features, or the cached profile, can change the method
         self.sweep_method = "sweep"
-        self.read_features()
+        super().__init__(iface)
         logger.debug("Setting initial start,stop")
         self.start, self.stop = self._get_running_frequencies()
         self.sweep_max_freq_Hz = 300e6
-        self._sweepdata = []
+        self._sweepdata = (np.array([], dtype=np.complex128),) * 2
 
     def _get_running_frequencies(self):
         logger.debug("Reading values: frequencies")
@@ -63,13 +154,18 @@ class NanoVNA(VNABase):
         list(self.exec_command(f"sweep {start} {stop} {self.datapoints}"))
         list(self.exec_command("resume"))
 
-    def set_sweep(self, start, stop):
+    def set_sweep_steps(self, start, stop) -> Generator:
+        self._frequencies = None
         self.start = start
         self.stop = stop
-        if self.sweep_method == "sweep":
-            list(self.exec_command(f"sweep {start} {stop} {self.datapoints}"))
-        elif self.sweep_method == "scan":
-            list(self.exec_command(f"scan {start} {stop} {self.datapoints}"))
+        if command := self._sweep_command():
+            yield from self.command_steps(command)
+
+    def _sweep_command(self) -> str:
+        """Command setting the sweep on the device, None for scan masks."""
+        if self.sweep_method == "scan_mask":
+            return None
+        return f"{self.sweep_method} {self.start} {self.stop} {self.datapoints}"
 
     def read_features(self):
         super().read_features()
@@ -77,21 +173,85 @@ class NanoVNA(VNABase):
             logger.debug("Using scan mask command.")
             self.features.add("Scan mask command")
             self.sweep_method = "scan_mask"
+            if self._probe_binary_scan():
+                logger.debug("Using binary scan.")
+                self.features.add("Scan binary")
         elif self.version >= Version("0.2.0"):
             logger.debug("Using new scan command.")
             self.features.add("Scan command")
             self.sweep_method = "scan"
 
-    def read_frequencies(self) -> list[int]:
+    def read_frequencies_steps(self) -> Generator:
         logger.debug("readFrequencies: %s", self.sweep_method)
         if self.sweep_method != "scan_mask":
-            return super().read_frequencies()
-        return [
-            int(line)
-            for line in self.exec_command(
-                f"scan {self.start} {self.stop} {self.datapoints} 0b001"
+            return (yield from super().read_frequencies_steps())
+        return (yield from self._scan_steps(SCAN_MASK_FREQUENCY))[0]
+
+    def _probe_binary_scan(self) -> bool:
+        """Check if the firmware supports binary scan output (DiSlord).
+
+        Scans the frequencies of the running sweep, which measures nothing
+        and leaves the sweep as it is.
+        """
+        try:
+            frequencies = super().read_values("frequencies")
+            self.run(
+                self._scan_binary_steps(
+                    frequencies[0],
+                    frequencies[-1],
+                    len(frequencies),
+                    SCAN_MASK_FREQUENCY,
+                )
+            )
+            return True
+        except (IOError, IndexError) as e:
+            logger.debug("No binary scan: %s", e)
+            return False
+
+    def _scan_binary_steps(self, start, stop, points: int, mask: int) -> Generator:
+        mask |= SCAN_MASK_BINARY
+        command = f"scan {start} {stop} {points} {mask:#05b}"
+        logger.debug("exec_command(%s)", command)
+        deadline = monotonic() + _command_timeout(self.bandwidth, points)
+        yield ClearInput()
+        yield Write(f"{command}\r".encode("ascii"))
+        yield SkipUntil(f"{command}\r\n".encode("ascii"), deadline)
+        header = yield ReadExact(4, deadline)
+        if header != struct.pack("<HH", mask, points):
+            raise IOError(f"Unexpected binary scan header: {header}")
+        data = yield ReadExact(points * scan_record(mask).itemsize, deadline)
+        yield SkipUntil(PROMPT, deadline)
+        return decode_scan(header, data)
+
+    def _scan_steps(self, mask: int) -> Generator:
+        if "Scan binary" in self.features:
+            return (
+                yield from self._scan_binary_steps(
+                    self.start, self.stop, self.datapoints, mask
+                )
             )
-        ]
+        raw = yield from self.command_steps(
+            f"scan {self.start} {self.stop} {self.datapoints} {mask:#05b}"
+        )
+        return parse_scan(raw, mask)
+
+    def _scan_data_steps(self) -> Generator:
+        """Run one scan, reading the frequencies too until they are cached."""
+        mask = SCAN_MASK_S11 | SCAN_MASK_S21
+        if self._frequencies is None:
+            frequencies, s11, s21 = yield from self._scan_steps(
+                mask | SCAN_MASK_FREQUENCY
+            )
+            self._cache_frequencies(frequencies)
+        else:
+            _, s11, s21 = yield from self._scan_steps(mask)
+        self._sweepdata = (s11, s21)
+        return s11, s21, self._frequencies
+
+    def read_sweep_steps(self) -> Generator:
+        if self.sweep_method != "scan_mask":
+            return (yield from super().read_sweep_steps())
+        return (yield from self._scan_data_steps())
 
     def read_values(self, value, overwrite_wait: float = 0.0) -> list[str]:
         if self.sweep_method != "scan_mask":
@@ -100,14 +260,8 @@ class NanoVNA(VNABase):
         # Actually grab the data only when requesting channel 0.
         # The hardware will return all channels which we will store.
         if value == "data 0":
-            self._sweepdata = []
-            for line in self.exec_command(
-                f"scan {self.start} {self.stop} {self.datapoints} 0b110",
-                min(self.wait, overwrite_wait),
-            ):
-                data = line.split()
-                self._sweepdata.append((f"{data[0]} {data[1]}", f"{data[2]} {data[3]}"))
+            self.run(self._scan_data_steps())
         if value == "data 0":
-            return [x[0] for x in self._sweepdata]
+            return [f"{x.real} {x.imag}" for x in self._sweepdata[0].tolist()]
         if value == "data 1":
-            return [x[1] for x in self._sweepdata]
+            return [f"{x.real} {x.imag}" for x in self._sweepdata[1].tolist()]
@@ -1,9 +1,20 @@
 import logging
 import platform
-from struct import pack, unpack_from
-from time import sleep
-
-from .Serial import Interface
+from collections.abc import Generator, Iterator
+from struct import pack
+from time import monotonic, sleep
+
+import numpy as np
+
+from .Serial import (
+    Interface,
+    ReadExact,
+    Sleep,
+    Write,
+    drain_serial,
+    read_exact,
+    read_into,
+)
 from .VNABase import VNABase
 from .Version import Version
 
@@ -47,11 +58,110 @@ _ADF4350_TXPOWER_DESC_REV_MAP = {
 }
 
 
+# One record of the values FIFO, "<iiiiiihxxxxxx".
+_FIFO_RECORD = np.dtype(
+    {
+        "names": (
+            "fwd_real",
+            "fwd_imag",
+            "rev0_real",
+            "rev0_imag",
+            "rev1_real",
+            "rev1_imag",
+            "freq_index",
+        ),
+        "formats": ("<i4",) * 6 + ("<i2",),
+        "offsets": (0, 4, 8, 12, 16, 20, 24),
+        "itemsize": 32,
+    }
+)
+
+
+# reset protocol to known state
+RESET_PROTOCOL = pack("<Q", 0)
+# write register 0x30 to clear FIFO
+CLEAR_FIFO = pack("<BBB", _CMD_WRITE, _ADDR_VALUES_FIFO, 0)
+# the FIFO is read at most 255 values at a time
+FIFO_CHUNK = 255
+
+# In raw samples mode the FIFO holds ADC samples instead of values, read in
+# the same 32 byte records.
+RAW_SAMPLE = np.dtype("<i2")
+
+# Registers are answered within milliseconds, but some devices miss reads
+# right after connecting (NanoVNA-Saver bug #585). Those are retried after
+# a protocol reset with the long timeout.
+REGISTER_TIMEOUT = 0.25
+REGISTER_RETRY_TIMEOUT = 2.0
+
+
+def read_fifo_command(points: int) -> bytes:
+    """Command reading up to 255 values from the FIFO, each 32 bytes."""
+    return pack("<BBB", _CMD_READFIFO, _ADDR_VALUES_FIFO, points)
+
+
+def fifo_timeout(points: int) -> float:
+    """Seconds to read a chunk of the FIFO.
+
+    The time required empirically is just over 3 seconds for 101 points
+    or 7 seconds for 255 points.
+    """
+    return min(points, FIFO_CHUNK) * 0.035 + 0.1
+
+
+def decode_fifo(data: bytes, points: int, spread: bool = False) -> np.ndarray:
+    """Decode values FIFO records into s11 and s21.
+
+    Records of the same frequency index, e.g. with more than one value per
+    frequency, are averaged.
+
+    Args:
+        data (bytes): Whole 32 byte records read from the FIFO.
+        points (int): Number of points in the sweep.
+        spread (bool): Also return the standard deviation of the values of
+            each point. Defaults to False.
+
+    Returns:
+        np.ndarray: Complex array of shape (2, points) holding s11 and s21,
+            placed by the frequency index of each record. With spread a
+            tuple of it and a float array of the same shape.
+    """
+    records = np.frombuffer(data, dtype=_FIFO_RECORD)
+    freq_index = records["freq_index"]
+    if len(records):
+        logger.debug("Freq index from: %i to: %i", freq_index[0], freq_index[-1])
+    fwd = records["fwd_real"] + 1j * records["fwd_imag"]
+    refl = records["rev0_real"] + 1j * records["rev0_imag"]
+    thru = records["rev1_real"] + 1j * records["rev1_imag"]
+    if not (valid := (freq_index >= 0) & (freq_index < points)).all():
+        logger.warning("Dropping %d values out of range", np.count_nonzero(~valid))
+        freq_index, fwd, refl, thru = (
+            x[valid] for x in (freq_index, fwd, refl, thru)
+        )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = np.stack((refl / fwd, thru / fwd))
+    counts = np.maximum(np.bincount(freq_index, minlength=points), 1)
+    sweepdata = np.empty((2, points), dtype=np.complex128)
+    power = np.empty((2, points)) if spread else None
+    for i, value in enumerate(values):
+        sweepdata[i].real = np.bincount(freq_index, value.real, points)
+        sweepdata[i].imag = np.bincount(freq_index, value.imag, points)
+        if spread:
+            power[i] = np.bincount(freq_index, np.abs(value) ** 2, points)
+    sweepdata /= counts
+    if not spread:
+        return sweepdata
+    power /= counts
+    variance = power - np.abs(sweepdata) ** 2
+    return sweepdata, np.sqrt(np.maximum(variance, 0.0))
+
+
 class NanoVNA_V2(VNABase):
     name = "NanoVNA-V2"
     valid_datapoints = (101, 11, 51, 201, 301, 501, 1023)
     screenwidth = 320
     screenheight = 240
+    local_frequencies = True
 
     def __init__(self, iface: Interface):
         super().__init__(iface)
@@ -73,8 +183,13 @@ class NanoVNA_V2(VNABase):
 
         self.sweep_start_Hz = 200e6
         self.sweep_step_Hz = 1e6
+        # values per frequency, averaged by decode_fifo
+        self.averaging = 1
+        # standard deviation of the values of the last sweep, see set_averaging
+        self.spread = None
+        self._read_spread = False
 
-        self._sweepdata = []
+        self._sweepdata = np.zeros((2, 0), np.complex128)
         self._update_sweep()
 
     def get_calibration(self) -> str:
@@ -82,9 +197,7 @@ class NanoVNA_V2(VNABase):
 
     def read_features(self):
         self.features.add("Customizable data points")
-        # TODO: more than one dp per freq
         self.features.add("Multi data points")
-        self.board_revision = self.read_board_revision()
         if self.board_revision >= Version("2.0.4"):
             self.sweep_max_freq_Hz = 4400e6
         else:
@@ -103,128 +216,145 @@ class NanoVNA_V2(VNABase):
             ]
 
     def read_firmware(self) -> str:
-        result = f"HW: {self.read_board_revision()}\nFW: {self.version}"
+        result = f"HW: {self.board_revision}\nFW: {self.version}"
         logger.debug("readFirmware: %s", result)
         return result
 
-    def read_frequencies(self) -> list[int]:
-        return [
-            int(self.sweep_start_Hz + i * self.sweep_step_Hz)
-            for i in range(self.datapoints)
-        ]
-
-    def _read_pointstoread(self, pointstoread, arr) -> None:
-        freq_index = -1
-
-        for i in range(pointstoread):
-            (
-                fwd_real,
-                fwd_imag,
-                rev0_real,
-                rev0_imag,
-                rev1_real,
-                rev1_imag,
-                freq_index,
-            ) = unpack_from("<iiiiiihxxxxxx", arr, i * 32)
-            fwd = complex(fwd_real, fwd_imag)
-            refl = complex(rev0_real, rev0_imag)
-            thru = complex(rev1_real, rev1_imag)
-            if i == 0:
-                logger.debug("Freq index from: %i", freq_index)
-            self._sweepdata[freq_index] = (refl / fwd, thru / fwd)
-
-        logger.debug("Freq index to: %i", freq_index)
+    def read_frequencies(self) -> np.ndarray:
+        steps = np.arange(self.datapoints) * self.sweep_step_Hz
+        return (self.sweep_start_Hz + steps).astype(np.int64)
+
+    def _read_sweepdata_steps(self, overwrite_wait: float = 0.0) -> Generator:
+        """Read the values FIFO of a sweep into _sweepdata.
+
+        Raises:
+            IOError: If the values do not arrive in time.
+        """
+        wait = min(self.wait, overwrite_wait)
+        # reset protocol to known state
+        yield Write(RESET_PROTOCOL)
+        yield Sleep(wait)
+        yield Write(CLEAR_FIFO)
+        yield Sleep(wait)
+        records = self._fifo_records()
+        data = bytearray(records * 32)
+        view = memoryview(data)
+        for offset in range(0, records, FIFO_CHUNK):
+            logger.debug("reading values")
+            chunk = min(FIFO_CHUNK, records - offset)
+            timeout = 2 * fifo_timeout(chunk)
+            yield Write(read_fifo_command(chunk))
+            yield Sleep(wait)
+            # each value is 32 bytes
+            view[offset * 32 : (offset + chunk) * 32] = yield ReadExact(
+                chunk * 32, monotonic() + timeout
+            )
+        self._decode_sweepdata(data)
+        return self._sweepdata
+
+    def _fifo_records(self) -> int:
+        """Number of FIFO records of a sweep."""
+        s21hack = 1 if "S21 hack" in self.features else 0
+        return (self.datapoints + s21hack) * self.averaging
+
+    def _decode_sweepdata(self, data: bytes):
+        s21hack = 1 if "S21 hack" in self.features else 0
+        sweepdata = decode_fifo(data, self.datapoints + s21hack, self._read_spread)
+        if self._read_spread:
+            sweepdata, spread = sweepdata
+            self.spread = spread[:, s21hack:]
+        self._sweepdata = sweepdata[:, s21hack:]
+
+    def read_sweep_steps(self) -> Generator:
+        s11, s21 = yield from self._read_sweepdata_steps()
+        return s11, s21, self.sweep_frequencies()
 
     def read_values(self, value, overwrite_wait: float = 0.0) -> list[str]:
         # Actually grab the data only when requesting channel 0.
         # The hardware will return all channels which we will store.
         if value == "data 0":
-            s21hack = 1 if "S21 hack" in self.features else 0
-            # reset protocol to known state
-            timeout = self.serial.timeout
-            with self.serial.lock:
-                self.serial.write(pack("<Q", 0))
-                sleep(min(self.wait, overwrite_wait))
-                # cmd: write register 0x30 to clear FIFO
-                self.serial.write(pack("<BBB", _CMD_WRITE, _ADDR_VALUES_FIFO, 0))
-                sleep(min(self.wait, overwrite_wait))
-                # clear sweepdata
-                self._sweepdata = [(complex(), complex())] * (self.datapoints + s21hack)
-                pointstodo = self.datapoints + s21hack
-                # we read at most 255 values at a time and the time required
-                # empirically is just over 3 seconds for 101 points or
-                # 7 seconds for 255 points
-                self.serial.timeout = min(pointstodo, 255) * 0.035 + 0.1
-                while pointstodo > 0:
-                    logger.debug("reading values")
-                    pointstoread = min(255, pointstodo)
-                    # cmd: read FIFO, addr 0x30
-                    self.serial.write(
-                        pack(
-                            "<BBB",
-                            _CMD_READFIFO,
-                            _ADDR_VALUES_FIFO,
-                            pointstoread,
-                        )
-                    )
-                    sleep(min(self.wait, overwrite_wait))
-                    # each value is 32 bytes
-                    nBytes = pointstoread * 32
-
-                    # serial .read() will try to read nBytes bytes in
-                    # timeout secs
-                    arr = self.serial.read(nBytes)
-                    if nBytes != len(arr):
-                        logger.warning("expected %d bytes, got %d", nBytes, len(arr))
-                        # the way to retry on timeout is keep the data
-                        # already read then try to read the rest of
-                        # the data into the array
-                        if nBytes > len(arr):
-                            arr = arr + self.serial.read(nBytes - len(arr))
-                    if nBytes != len(arr):
-                        return []
-
-                    self._read_pointstoread(pointstoread, arr)
-
-                    pointstodo = pointstodo - pointstoread
-            self.serial.timeout = timeout
-
-            if s21hack:
-                self._sweepdata = self._sweepdata[1:]
+            try:
+                self.run(self._read_sweepdata_steps(overwrite_wait))
+            except IOError as e:
+                logger.warning("%s reading the values FIFO", e)
+                self._sweepdata = np.zeros((2, 0), np.complex128)
+                return []
 
         idx = 1 if value == "data 1" else 0
-        return [f"{str(x[idx].real)} {str(x[idx].imag)}" for x in self._sweepdata]
+        return [f"{x.real} {x.imag}" for x in self._sweepdata[idx].tolist()]
 
     def reset_sweep(self, start: int, stop: int):
         self.set_sweep(start, stop)
 
-    def _read_version(self, cmd_0: int, cmd_1: int):
-        cmd = pack("<BBBB", _CMD_READ, cmd_0, _CMD_READ, cmd_1)
+    def _read_registers(self, *addresses: int) -> bytes:
+        """Read one byte registers, requested with a single write.
+
+        Returns as soon as all values arrived. If they do not arrive within
+        REGISTER_TIMEOUT the protocol is reset and the read repeated once,
+        waiting up to REGISTER_RETRY_TIMEOUT.
+
+        Raises:
+            IOError: If the retry times out as well.
+
+        Returns:
+            bytes: A byte per register.
+        """
+        cmd = b"".join(pack("<BB", _CMD_READ, address) for address in addresses)
         with self.serial.lock:
             self.serial.write(cmd)
-            # sleep(self.wait)
-            sleep(2.0)  # could fix bug #585 but shoud be done
-            # in a more predictive way
-            resp = self.serial.read(2)
-        if len(resp) != 2:
-            logger.error("Timeout reading version registers. Got: %s", resp)
-            raise IOError("Timeout reading version registers")
+            try:
+                return read_exact(
+                    self.serial, len(addresses), monotonic() + REGISTER_TIMEOUT
+                )
+            except IOError as e:
+                logger.debug("Retrying register read: %s", e)
+            self.serial.write(RESET_PROTOCOL)
+            drain_serial(self.serial)
+            self.serial.write(cmd)
+            try:
+                return read_exact(
+                    self.serial, len(addresses), monotonic() + REGISTER_RETRY_TIMEOUT
+                )
+            except IOError as e:
+                logger.error("Timeout reading registers: %s", e)
+                raise IOError("Timeout reading version registers") from e
+
+    def _read_version(self, cmd_0: int, cmd_1: int):
+        resp = self._read_registers(cmd_0, cmd_1)
         return Version(f"{resp[0]}.0.{resp[1]}")
 
     def read_version(self) -> "Version":
-        result = self._read_version(_ADDR_FW_MAJOR, _ADDR_FW_MINOR)
+        # the board revision is read with the same write, for read_features
+        resp = self._read_registers(
+            _ADDR_FW_MAJOR,
+            _ADDR_FW_MINOR,
+            _ADDR_DEVICE_VARIANT,
+            _ADDR_HARDWARE_REVISION,
+        )
+        result = Version(f"{resp[0]}.0.{resp[1]}")
+        self.board_revision = Version(f"{resp[2]}.0.{resp[3]}")
         logger.debug("readVersion: %s", result)
         return result
 
+    def read_device_id(self) -> str:
+        # the binary protocol has no serial number
+        return None
+
     def read_board_revision(self) -> "Version":
         result = self._read_version(_ADDR_DEVICE_VARIANT, _ADDR_HARDWARE_REVISION)
         logger.debug("read_board_revision: %s", result)
         return result
 
-    def set_sweep(self, start, stop):
+    def set_sweep_steps(self, start, stop) -> Generator:
+        self._frequencies = None
+        if self._set_sweep_range(start, stop):
+            yield from self._update_sweep_steps()
+
+    def _set_sweep_range(self, start, stop) -> bool:
+        """Set start and step, returns if they changed."""
         step = (stop - start) / (self.datapoints - 1)
         if start == self.sweep_start_Hz and step == self.sweep_step_Hz:
-            return
+            return False
         self.sweep_start_Hz = start
         self.sweep_step_Hz = step
         logger.info(
@@ -232,10 +362,9 @@ class NanoVNA_V2(VNABase):
             self.sweep_start_Hz,
             self.sweep_step_Hz,
         )
-        self._update_sweep()
-        return
+        return True
 
-    def _update_sweep(self):
+    def _sweep_command(self) -> bytes:
         s21hack = "S21 hack" in self.features
         cmd = pack(
             "<BBQ",
@@ -245,10 +374,83 @@ class NanoVNA_V2(VNABase):
         )
         cmd += pack("<BBQ", _CMD_WRITE8, _ADDR_SWEEP_STEP, int(self.sweep_step_Hz))
         cmd += pack("<BBH", _CMD_WRITE2, _ADDR_SWEEP_POINTS, self.datapoints + s21hack)
-        cmd += pack("<BBH", _CMD_WRITE2, _ADDR_SWEEP_VALS_PER_FREQ, 1)
+        cmd += pack("<BBH", _CMD_WRITE2, _ADDR_SWEEP_VALS_PER_FREQ, self.averaging)
+        return cmd
+
+    def _update_sweep(self):
+        self.run(self._update_sweep_steps())
+
+    def _update_sweep_steps(self) -> Generator:
+        yield Write(self._sweep_command())
+        yield Sleep(self.wait)
+
+    def raw_samples(self, records: int = FIFO_CHUNK) -> Iterator[np.ndarray]:
+        """Stream raw ADC samples for processing them on the host.
+
+        Switches the device to raw samples mode and reads the FIFO in
+        chunks into a preallocated buffer. Normal mode is restored when the
+        generator is closed, e.g. by leaving the for loop.
+
+        Args:
+            records (int): FIFO records per chunk, each holds 16 samples.
+                Defaults to 255, one FIFO read.
+
+        Yields:
+            np.ndarray: The int16 samples of a chunk. It is a view of the
+                buffer, which is overwritten by the next chunk, copy it to
+                keep it.
+        """
+        data = bytearray(records * 32)
+        view = memoryview(data)
+        samples = np.frombuffer(data, dtype=RAW_SAMPLE)
         with self.serial.lock:
-            self.serial.write(cmd)
-            sleep(self.wait)
+            self.serial.write(RESET_PROTOCOL)
+            self._set_register(_ADDR_RAW_SAMPLES_MODE, 1, 1)
+            self.serial.write(CLEAR_FIFO)
+        try:
+            while True:
+                with self.serial.lock:
+                    for offset in range(0, records, FIFO_CHUNK):
+                        chunk = min(FIFO_CHUNK, records - offset)
+                        self.serial.write(read_fifo_command(chunk))
+                        read_into(
+                            self.serial,
+                            view[offset * 32 : (offset + chunk) * 32],
+                            monotonic() + 2 * fifo_timeout(chunk),
+                        )
+                yield samples
+        finally:
+            with self.serial.lock:
+                self.serial.write(RESET_PROTOCOL)
+                self._set_register(_ADDR_RAW_SAMPLES_MODE, 0, 1)
+                drain_serial(self.serial)
+                self.serial.write(CLEAR_FIFO)
+
+    def set_averaging(self, n: int, spread: bool = False):
+        """Measure every frequency n times and average the values.
+
+        The device takes the n values per frequency in one sweep, the
+        driver reads them all from the FIFO and averages them per point.
+
+        Args:
+            n (int): Values per frequency, 1 to turn averaging off.
+            spread (bool): Keep the standard deviation of the values of each
+                point of the last sweep in `spread`, shape (2, datapoints)
+                for s11 and s21. Defaults to False.
+
+        Raises:
+            ValueError: If n is not in 1..65535, or the firmware (before
+                1.0.2) does not support averaging.
+        """
+        if n != 1 and "Set Average" not in self.features:
+            raise ValueError(f"Firmware {self.version} does not support averaging")
+        if not 1 <= n <= 0xFFFF:
+            raise ValueError(f"Values per frequency must be 1..65535, not {n}")
+        self._read_spread = spread
+        self.spread = None
+        if n != self.averaging:
+            self.averaging = n
+            self._update_sweep()
 
     def setTXPower(self, freq_range, power_desc):
         if freq_range[0] != 140e6:
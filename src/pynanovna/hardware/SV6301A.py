@@ -1,4 +1,5 @@
 import logging
+from typing import Generator
 
 from .NanoVNA import NanoVNA
 from .Serial import Interface
@@ -18,7 +19,8 @@ class SV6301A(NanoVNA):
         super().__init__(iface)
         self.sweep_max_freq_Hz = 6.3e9
 
-    def set_sweep(self, start, stop):
+    def set_sweep_steps(self, start, stop) -> Generator:
+        self._frequencies = None
         self.start = start
         self.stop = stop
-        list(self.exec_command(f"scan {start} {stop} {self.datapoints}"))
+        yield from self.command_steps(f"scan {start} {stop} {self.datapoints}")
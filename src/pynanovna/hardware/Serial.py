@@ -1,10 +1,31 @@
 import logging
+from collections import namedtuple
 from threading import Lock
+from time import monotonic, sleep
 
 import serial
 
 logger = logging.getLogger(__name__)
 
+PROMPT = b"ch> "
+
+# I/O steps of a transaction. Drivers build commands and decode responses in
+# generators that yield these steps and get the data read sent back, so the
+# same protocol code runs on a blocking port (run_transaction) and in
+# asyncio (aio.AsyncSerial.run).
+# Run a text command, answered with its output without echo and prompt.
+TextCommand = namedtuple("TextCommand", "command timeout")
+# Write bytes.
+Write = namedtuple("Write", "data")
+# Discard buffered input.
+ClearInput = namedtuple("ClearInput", "")
+# Read exactly size bytes, answered with the bytes.
+ReadExact = namedtuple("ReadExact", "size deadline")
+# Discard input up to and including expected.
+SkipUntil = namedtuple("SkipUntil", "expected deadline")
+# Wait, e.g. for the device to apply a setting.
+Sleep = namedtuple("Sleep", "seconds")
+
 
 def drain_serial(serial_port: serial.Serial):
     """drain up to 64k outstanding data in the serial incoming buffer"""
@@ -20,6 +41,191 @@ def drain_serial(serial_port: serial.Serial):
     logger.warning("unable to drain all data")
 
 
+class ResponseFramer:
+    def __init__(self, echo: bytes):
+        """Find the response of a text command in the data read so far.
+
+        The response is framed by the echo of the command and the prompt.
+        Output ending with a prompt but without the echo is left over from
+        an earlier command and is skipped.
+
+        Args:
+            echo (bytes): The echoed command line, including the line break.
+        """
+        self.echo = echo
+        self.buffer = bytearray()
+        self.skipped = None
+
+    def feed(self, data: bytes) -> bytes:
+        """Add data read from the port.
+
+        Returns:
+            bytes: The output between the echo and the prompt, or None if the
+                response is not complete yet.
+        """
+        self.buffer += data
+        if self.buffer.endswith(PROMPT):
+            if (start := self.buffer.find(self.echo)) >= 0:
+                return bytes(self.buffer[start + len(self.echo) : -len(PROMPT)])
+            logger.debug("Skipping stale output: %s", bytes(self.buffer))
+            self.skipped = bytes(self.buffer[: -len(PROMPT)])
+            self.buffer.clear()
+        return None
+
+    def timeout(self) -> bytes:
+        """Handle the deadline passing.
+
+        Raises:
+            IOError: If no complete response was read.
+
+        Returns:
+            bytes: The skipped output, if nothing came after it, since the
+                device does not echo commands.
+        """
+        if self.skipped is not None and not self.buffer:
+            return self.skipped
+        raise IOError(f"timeout waiting for prompt, got: {bytes(self.buffer)}")
+
+
+def read_response(serial_port: serial.Serial, echo: bytes, timeout: float) -> bytes:
+    """Read the response of a text command, framed by its echo and the prompt.
+
+    Data is read in chunks of whatever is waiting, so there are no fixed
+    sleeps.
+
+    Args:
+        serial_port (serial.Serial): The port the command was written to.
+        echo (bytes): The echoed command line, including the line break.
+        timeout (float): Deadline in seconds for the whole response.
+
+    Raises:
+        IOError: If the prompt does not arrive before the deadline.
+
+    Returns:
+        bytes: The output between the echo and the prompt.
+    """
+    deadline = monotonic() + timeout
+    framer = ResponseFramer(echo)
+    while True:
+        response = framer.feed(serial_port.read(serial_port.in_waiting or 1))
+        if response is not None:
+            return response
+        if monotonic() > deadline:
+            return framer.timeout()
+
+
+def read_exact(serial_port: serial.Serial, size: int, deadline: float) -> bytes:
+    """Read exactly size bytes of binary output.
+
+    Args:
+        serial_port (serial.Serial): The port to read from.
+        size (int): Number of bytes to read.
+        deadline (float): time.monotonic() value to give up at.
+
+    Raises:
+        IOError: If the bytes do not arrive before the deadline.
+
+    Returns:
+        bytes: The data.
+    """
+    data = bytearray()
+    while len(data) < size:
+        data += serial_port.read(min(size - len(data), serial_port.in_waiting or 1))
+        if len(data) < size and monotonic() > deadline:
+            raise IOError(f"timeout reading {size} bytes, got {len(data)}")
+    return bytes(data)
+
+
+def read_into(serial_port: serial.Serial, buffer: memoryview, deadline: float):
+    """Fill a buffer with binary output, reading into it in place.
+
+    Args:
+        serial_port (serial.Serial): The port to read from.
+        buffer (memoryview): Writable buffer to fill, e.g. a slice of a
+            preallocated bytearray.
+        deadline (float): time.monotonic() value to give up at.
+
+    Raises:
+        IOError: If the buffer is not filled before the deadline.
+    """
+    filled = 0
+    while filled < len(buffer):
+        filled += serial_port.readinto(buffer[filled:])
+        if filled < len(buffer) and monotonic() > deadline:
+            raise IOError(f"timeout reading {len(buffer)} bytes, got {filled}")
+
+
+def skip_until(serial_port: serial.Serial, expected: bytes, deadline: float):
+    """Discard input up to and including expected, e.g. a command echo.
+
+    Raises:
+        IOError: If expected does not arrive before the deadline.
+    """
+    buffer = bytearray()
+    while not buffer.endswith(expected):
+        buffer += serial_port.read(1)
+        if monotonic() > deadline:
+            raise IOError(f"timeout waiting for {expected}, got: {bytes(buffer)}")
+
+
+def text_command(serial_port: serial.Serial, command: str, timeout: float) -> bytes:
+    """Run a text command and return its output, without echo and prompt.
+
+    The caller holds the lock of the port.
+
+    Raises:
+        IOError: If the command does not finish before the timeout.
+    """
+    logger.debug("exec_command(%s)", command)
+    serial_port.reset_input_buffer()
+    serial_port.write(f"{command}\r".encode("ascii"))
+    return read_response(serial_port, f"{command}\r\n".encode("ascii"), timeout)
+
+
+def run_step(serial_port: serial.Serial, step: tuple):
+    """Do one I/O step of a transaction, see TextCommand.
+
+    Returns:
+        The data read by the step, None for steps that do not read.
+    """
+    if isinstance(step, TextCommand):
+        return text_command(serial_port, step.command, step.timeout)
+    if isinstance(step, ReadExact):
+        return read_exact(serial_port, step.size, step.deadline)
+    if isinstance(step, Write):
+        serial_port.write(step.data)
+    elif isinstance(step, ClearInput):
+        serial_port.reset_input_buffer()
+    elif isinstance(step, SkipUntil):
+        skip_until(serial_port, step.expected, step.deadline)
+    elif isinstance(step, Sleep):
+        sleep(step.seconds)
+    else:
+        raise TypeError(f"Unknown I/O step: {step}")
+    return None
+
+
+def run_transaction(serial_port: serial.Serial, transaction):
+    """Run the I/O steps yielded by a driver generator, holding the port lock.
+
+    Args:
+        serial_port (serial.Serial): The port, with a lock.
+        transaction (Generator): Yields the steps, gets the data read by
+            each step sent back.
+
+    Returns:
+        The return value of the generator.
+    """
+    with serial_port.lock:
+        reply = None
+        while True:
+            try:
+                step = transaction.send(reply)
+            except StopIteration as done:
+                return done.value
+            reply = run_step(serial_port, step)
+
+
 class Interface(serial.Serial):
     def __init__(self, interface_type: str, comment, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -27,6 +233,8 @@ class Interface(serial.Serial):
         self.type = interface_type
         self.comment = comment
         self.port = None
+        # USB serial number, from discovery
+        self.serial_number = None
         self.baudrate = 115200
         self.timeout = 0.05
         self.lock = Lock()
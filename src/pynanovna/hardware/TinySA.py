@@ -1,10 +1,11 @@
 import logging
 import struct
+from typing import Generator
 
 import numpy as np
 
 from .Serial import drain_serial, Interface
-from .VNABase import VNABase
+from .VNABase import VNABase, parse_table
 
 logger = logging.getLogger(__name__)
 
@@ -62,28 +63,48 @@ class TinySA(VNABase):
     def reset_sweep(self, start: int, stop: int):
         return
 
-    def set_sweep(self, start, stop):
+    def set_sweep_steps(self, start, stop) -> Generator:
+        self._frequencies = None
         self.start = start
         self.stop = stop
-        list(self.exec_command(f"sweep {start} {stop} {self.datapoints}"))
-        list(self.exec_command("trigger auto"))
+        yield from self.command_steps(f"sweep {start} {stop} {self.datapoints}")
+        yield from self.command_steps("trigger auto")
 
-    def read_frequencies(self) -> list[int]:
-        logger.debug("readFrequencies")
-        return [int(line) for line in self.exec_command("frequencies")]
+    def _read_level(self, overwrite_wait: float = 0.0) -> np.ndarray:
+        return self.run(self._read_level_steps())
 
-    def read_values(self, value, overwrite_wait: float = 0.0) -> list[str]:
+    def _read_level_steps(self) -> Generator:
         def conv2float(data: str) -> float:
             try:
                 return 10 ** (float(data.strip()) / 20)
             except ValueError:
                 return 0.0
 
+        raw = yield from self.command_steps("data 0")
+        try:
+            return 10 ** (parse_table(raw, 1)[:, 0] / 20) + 0j
+        except ValueError:
+            # garbled lines read as zero level, parse line by line
+            return np.array(
+                [
+                    conv2float(line)
+                    for line in raw.decode("ascii").splitlines()
+                    if line.strip()
+                ],
+                dtype=np.complex128,
+            )
+
+    def read_sweep_steps(self) -> Generator:
+        """Run a sweep, the level is returned both as s11 and as s21."""
+        frequencies = yield from self.sweep_frequencies_steps()
+        level = yield from self._read_level_steps()
+        return level, level.copy(), frequencies
+
+    def read_values(self, value, overwrite_wait: float = 0.0) -> list[str]:
         logger.debug("Read: %s", value)
         if value == "data 0":
             self._sweepdata = [
-                f"{conv2float(line)} 0.0"
-                for line in self.exec_command("data 0", min(self.wait, overwrite_wait))
+                f"{x.real} 0.0" for x in self._read_level(overwrite_wait).tolist()
             ]
         return self._sweepdata
 
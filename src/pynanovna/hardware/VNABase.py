@@ -1,9 +1,12 @@
 import logging
 from time import sleep
-from typing import Iterator
+from typing import Generator, Iterator
+
+import numpy as np
 
 from .Version import Version
-from .Serial import Interface, drain_serial
+from .Serial import Interface, TextCommand, run_transaction
+from .profile import profiles
 
 logger = logging.getLogger(__name__)
 
@@ -22,18 +25,48 @@ DISLORD_BW = {
 }
 
 
-def _max_retries(bandwidth: int, datapoints: int) -> int:
-    return round(
+def _command_timeout(bandwidth: int, datapoints: int) -> float:
+    """Deadline in seconds for a command, long enough for a full sweep."""
+    return 0.05 * (
         20 + 20 * (datapoints / 101) + (1000 / bandwidth) ** 1.30 * (datapoints / 101)
     )
 
 
+def parse_table(raw: bytes, columns: int) -> np.ndarray:
+    """Parse a whole response of whitespace separated numbers in one call.
+
+    Args:
+        raw (bytes): Output of a command, as returned by exec_raw.
+        columns (int): Number of values on each line.
+
+    Raises:
+        ValueError: If the output is not numeric or not a whole number of lines.
+
+    Returns:
+        np.ndarray: float64 array of shape (points, columns).
+    """
+    # np.fromstring would be as fast, but NumPy 1.x stops at text it cannot
+    # parse with only a warning, converting the tokens raises on any version
+    values = np.array(raw.split(), dtype=np.float64)
+    if values.size % columns:
+        raise ValueError(f"Got {values.size} values, expected {columns} per line")
+    return values.reshape(-1, columns)
+
+
+def parse_complex(raw: bytes) -> np.ndarray:
+    """Parse a response of "real imag" lines into a complex array."""
+    values = parse_table(raw, 2)
+    return values[:, 0] + 1j * values[:, 1]
+
+
 class VNABase:
     name = "VNA"
     valid_datapoints = (101, 51, 11)
     SN = "NOT SUPPORTED"
     sweep_points_max = 101
     sweep_points_min = 11
+    # read_frequencies computes the grid without asking the device
+    local_frequencies = False
 
     def __init__(self, iface: Interface):
         self.serial = iface
@@ -48,9 +81,19 @@ class VNABase:
         # frequency. Put default output power first.
         self.txPowerRanges = []
         self.wait = 0.05
+        self.bandwidths = None
+        self.firmware_info = None
+        self._frequencies = None
+        self.device_id = None
         if self.connected():
             self.version = self.read_version()
-            self.read_features()
+            self.device_id = self.read_device_id()
+            if not profiles.load(self):
+                self.read_features()
+                if "Bandwidth" in self.features:
+                    self.get_bandwidths()
+                self.firmware_info = self.read_firmware()
+                profiles.save(self)
             logger.debug("Features: %s", self.features)
             #  cannot read current bandwidth, so set to highest
             #  to get initial sweep fast
@@ -73,29 +116,42 @@ class VNABase:
         self.connect()
         sleep(self.wait)
 
+    def run(self, transaction: Generator):
+        """Run a transaction on the serial port, see Serial.run_transaction.
+
+        Transactions are the generator methods named *_steps. They build the
+        commands and decode the responses without doing I/O, so they run on
+        other transports too, see aio.AsyncVNA.
+        """
+        return run_transaction(self.serial, transaction)
+
+    def exec_raw(self, command: str) -> bytes:
+        """Run a command and return its raw output, without echo and prompt.
+
+        Args:
+            command (str): The command.
+
+        Raises:
+            IOError: If the command does not finish before its deadline.
+
+        Returns:
+            bytes: The output of the command.
+        """
+        return self.run(self.command_steps(command))
+
+    def command_steps(self, command: str) -> Generator:
+        """Transaction of exec_raw."""
+        timeout = _command_timeout(self.bandwidth, self.datapoints)
+        return (yield TextCommand(command, timeout))
+
     def exec_command(self, command: str, overwrite_wait: float = 0.0) -> Iterator[str]:
-        logger.debug("exec_command(%s)", command)
-        with self.serial.lock:
-            drain_serial(self.serial)
-            self.serial.write(f"{command}\r".encode("ascii"))
-            sleep(min(self.wait, overwrite_wait))
-            retries = 0
-            max_retries = _max_retries(self.bandwidth, self.datapoints)
-            logger.debug("Max retries: %s", max_retries)
-            while True:
-                line = self.serial.readline()
-                line = line.decode("ascii").strip()
-                if not line:
-                    retries += 1
-                    if retries > max_retries:
-                        raise IOError("too many retries")
-                    sleep(min(self.wait, overwrite_wait))
-                    continue
-                if line == command:  # suppress echo
-                    continue
-                if line.startswith("ch>"):
-                    logger.debug("Needed retries: %s", retries)
-                    break
+        """Run a command and yield the non empty lines of its output.
+
+        overwrite_wait has no effect, the output is read as soon as the
+        prompt arrives. It is kept for compatibility.
+        """
+        for line in self.exec_raw(command).decode("ascii").splitlines():
+            if line := line.strip():
                 yield line
 
     def read_features(self):
@@ -103,7 +159,8 @@ class VNABase:
         logger.debug("result:\n%s", result)
         if "sn:" in result:
             self.features.add("SN")
-            self.SN = self.get_serial_number()
+            # read once by the handshake, for the profile cache
+            self.SN = self.device_id or self.get_serial_number()
         if "bandwidth" in result:
             self.features.add("Bandwidth")
             result = " ".join(list(self.exec_command("bandwidth")))
@@ -114,6 +171,11 @@ class VNABase:
 
     def get_bandwidths(self) -> list[int]:
         logger.debug("get bandwidths")
+        if self.bandwidths is None:
+            self.bandwidths = self._read_bandwidths()
+        return self.bandwidths
+
+    def _read_bandwidths(self) -> list[int]:
         if self.bw_method == "dislord":
             return list(DISLORD_BW.keys())
         result = " ".join(list(self.exec_command("bandwidth")))
@@ -132,8 +194,55 @@ class VNABase:
             raise IOError(f"set_bandwith({bandwidth}: {result}")
         self.bandwidth = bandwidth
 
-    def read_frequencies(self) -> list[int]:
-        return [int(f) for f in self.read_values("frequencies")]
+    def read_frequencies(self) -> np.ndarray:
+        return self.run(self.read_frequencies_steps())
+
+    def read_frequencies_steps(self) -> Generator:
+        """Transaction of read_frequencies."""
+        raw = yield from self.command_steps("frequencies")
+        return parse_table(raw, 1)[:, 0].astype(np.int64)
+
+    def sweep_frequencies(self, read: bool = True) -> np.ndarray:
+        """Get the frequencies of the current sweep, cached until set_sweep.
+
+        Args:
+            read (bool): Ask the device if the frequencies are not cached.
+                Drivers with local_frequencies compute them either way.
+                Defaults to True.
+
+        Returns:
+            np.ndarray: The frequencies in Hz, or None if they are not cached
+                and read is False.
+        """
+        if self._frequencies is None and (read or self.local_frequencies):
+            self._cache_frequencies(self.read_frequencies())
+        return self._frequencies
+
+    def sweep_frequencies_steps(self) -> Generator:
+        """Transaction of sweep_frequencies."""
+        if self._frequencies is None and not self.local_frequencies:
+            self._cache_frequencies((yield from self.read_frequencies_steps()))
+        return self.sweep_frequencies(read=False)
+
+    def _cache_frequencies(self, frequencies: np.ndarray):
+        self._frequencies = np.asarray(frequencies, dtype=np.int64)
+        # shared by every sweep on the grid
+        self._frequencies.flags.writeable = False
+
+    def read_sweep(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Run a sweep and return the data as arrays.
+
+        Returns:
+            tuple: s11 and s21 as complex128 arrays, frequencies as int64 array.
+        """
+        return self.run(self.read_sweep_steps())
+
+    def read_sweep_steps(self) -> Generator:
+        """Transaction of read_sweep."""
+        frequencies = yield from self.sweep_frequencies_steps()
+        s11 = parse_complex((yield from self.command_steps("data 0")))
+        s21 = parse_complex((yield from self.command_steps("data 1")))
+        return s11, s21, frequencies
 
     def reset_sweep(self, start: int, stop: int):
         pass
@@ -182,7 +291,12 @@ class VNABase:
         return Version(result[0])
 
     def set_sweep(self, start, stop):
-        list(self.exec_command(f"sweep {start} {stop} {self.datapoints}"))
+        self.run(self.set_sweep_steps(start, stop))
+
+    def set_sweep_steps(self, start, stop) -> Generator:
+        """Transaction of set_sweep."""
+        self._frequencies = None
+        yield from self.command_steps(f"sweep {start} {stop} {self.datapoints}")
 
     def set_TX_power(self, freq_range, power_desc):
         raise NotImplementedError()
@@ -190,6 +304,22 @@ class VNABase:
     def get_serial_number(self) -> str:
         return " ".join(list(self.exec_command("sn")))
 
+    def read_device_id(self) -> str:
+        """Read the serial number identifying the device for its cached profile.
+
+        Returns:
+            str: The serial number, None if the firmware has no sn command.
+        """
+        try:
+            sn = self.get_serial_number()
+        except IOError as e:
+            logger.debug("No serial number: %s", e)
+            return None
+        # the shell answers unknown commands with the command and a "?"
+        if not sn or sn.endswith("?"):
+            return None
+        return sn
+
     def set_wait(self, new_wait: float):
         if new_wait < 0.05:
             logger.critical(
@@ -0,0 +1,153 @@
+import json
+import logging
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from serial.tools.list_ports_common import ListPortInfo
+
+from .Hardware import NAME2DEVICE, get_comment, get_ports
+from .profile import CACHE_DIR
+from .Serial import Interface
+
+logger = logging.getLogger(__name__)
+
+CACHE_FORMAT = 1
+
+DEFAULT_CACHE_FILE = os.path.join(CACHE_DIR, "devices.json")
+
+
+class DeviceDescriptor(
+    namedtuple("DeviceDescriptor", "port vid pid usb_serial typename variant")
+):
+    """A connected device, as found by discover().
+
+    Attributes:
+        port (str): The serial port.
+        vid (int): USB vendor id.
+        pid (int): USB product id.
+        usb_serial (str): USB serial number, None if the device has none.
+        typename (str): USB device type, e.g. "NanoVNA" or "S-A-A-2".
+        variant (str): Firmware variant, a key of Hardware.NAME2DEVICE.
+            None if probing failed.
+    """
+
+    __slots__ = ()
+
+    @property
+    def key(self) -> str:
+        """Cache key, the USB ids and serial number plus the port."""
+        return f"{self.vid:04x}:{self.pid:04x}:{self.usb_serial or ''}@{self.port}"
+
+    def interface(self) -> Interface:
+        """Get a closed interface for the device."""
+        iface = Interface("serial", self.typename)
+        iface.port = self.port
+        iface.serial_number = self.usb_serial
+        return iface
+
+
+def _descriptor(port_info: ListPortInfo, typename: str) -> DeviceDescriptor:
+    return DeviceDescriptor(
+        port_info.device,
+        port_info.vid,
+        port_info.pid,
+        port_info.serial_number,
+        typename,
+        None,
+    )
+
+
+def probe(port_info: ListPortInfo, typename: str) -> DeviceDescriptor:
+    """Open a port and detect the firmware variant of the device.
+
+    Args:
+        port_info (ListPortInfo): The port.
+        typename (str): USB device type of the port.
+
+    Returns:
+        DeviceDescriptor: The device, with variant None if probing failed.
+    """
+    descriptor = _descriptor(port_info, typename)
+    iface = descriptor.interface()
+    try:
+        iface.open()
+        try:
+            return descriptor._replace(variant=get_comment(iface))
+        finally:
+            iface.close()
+    except Exception as e:
+        logger.warning("Could not probe %s: %s", port_info.device, e)
+        return descriptor
+
+
+def _load_cache(cache_file: str) -> dict[str, DeviceDescriptor]:
+    try:
+        with open(cache_file, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") != CACHE_FORMAT:
+            return {}
+        devices = (DeviceDescriptor(**d) for d in data["devices"])
+        return {d.key: d for d in devices if d.variant in NAME2DEVICE}
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning("Ignoring device cache %s: %s", cache_file, e)
+        return {}
+
+
+def _save_cache(cache_file: str, descriptors: list[DeviceDescriptor]):
+    data = {
+        "format": CACHE_FORMAT,
+        "devices": [d._asdict() for d in descriptors if d.variant is not None],
+    }
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp_file = f"{cache_file}.tmp"
+        with open(tmp_file, mode="w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        logger.warning("Could not write device cache %s: %s", cache_file, e)
+
+
+def discover(
+    cache_file: str = DEFAULT_CACHE_FILE,
+    refresh: bool = False,
+    max_workers: int = None,
+) -> list[DeviceDescriptor]:
+    """Find the connected devices, probing all new ports at the same time.
+
+    Devices found before with the same USB serial number on the same port
+    are taken from the cache without opening their port.
+
+    Args:
+        cache_file (str): JSON file with the devices found before, None to
+            not use a cache. Defaults to ~/.cache/pynanovna/devices.json.
+        refresh (bool): Probe every port, even if it is cached.
+        max_workers (int): Number of ports probed at the same time.
+            Defaults to one thread per port.
+
+    Returns:
+        list[DeviceDescriptor]: The devices, in the order of get_interfaces().
+    """
+    cache = {} if cache_file is None or refresh else _load_cache(cache_file)
+    ports = get_ports()
+    descriptors = [None] * len(ports)
+    unknown = []
+    for i, port in enumerate(ports):
+        if (descriptor := cache.get(_descriptor(*port).key)) is not None:
+            logger.debug("Cached device on %s: %s", descriptor.port, descriptor.variant)
+            descriptors[i] = descriptor
+        else:
+            unknown.append(i)
+    if unknown:
+        logger.debug("Probing %d ports", len(unknown))
+        with ThreadPoolExecutor(max_workers or len(unknown)) as executor:
+            probed = executor.map(lambda i: probe(*ports[i]), unknown)
+            for i, descriptor in zip(unknown, probed):
+                descriptors[i] = descriptor
+        if cache_file is not None:
+            _save_cache(cache_file, descriptors)
+    return descriptors
+
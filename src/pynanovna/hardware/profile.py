@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+
+from .Version import Version, _Version
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+    "pynanovna",
+)
+
+CACHE_FORMAT = 2
+
+DEFAULT_CACHE_FILE = os.path.join(CACHE_DIR, "profiles.json")
+
+# Driver attributes found by the handshake, they only depend on the device
+# and its firmware.
+PROFILE_ATTRIBUTES = (
+    "features",
+    "SN",
+    "bw_method",
+    "bandwidths",
+    "valid_datapoints",
+    "sweep_max_freq_Hz",
+    "txPowerRanges",
+    "board_revision",
+    "sweep_method",
+    "firmware_info",
+)
+
+_DECODE = {
+    "features": set,
+    "valid_datapoints": tuple,
+    "board_revision": Version,
+    "txPowerRanges": lambda ranges: [(tuple(r), list(d)) for r, d in ranges],
+}
+
+
+def _encode(value):
+    if isinstance(value, _Version):
+        return str(value)
+    if isinstance(value, set):
+        return sorted(value)
+    return value
+
+
+class ProfileCache:
+    def __init__(self, cache_file: str = None):
+        """Capability profiles of devices, so reconnecting skips the handshake.
+
+        A profile holds the attributes a driver reads from the device, see
+        PROFILE_ATTRIBUTES. It is keyed by the driver, the serial number the
+        device reports (or its USB serial number if it reports none) and
+        the firmware version, so flashing other firmware gives a new
+        profile. Devices without either serial number are not cached.
+
+        Args:
+            cache_file (str): JSON file to keep the profiles in between runs.
+                Defaults to None, only keep them in memory.
+        """
+        self.cache_file = cache_file
+        self._profiles = None
+
+    @property
+    def profiles(self) -> dict[str, dict]:
+        if self._profiles is None:
+            self._profiles = self._read()
+        return self._profiles
+
+    def _read(self) -> dict[str, dict]:
+        if self.cache_file is None:
+            return {}
+        try:
+            with open(self.cache_file, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("format") != CACHE_FORMAT:
+                return {}
+            return dict(data["profiles"])
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Ignoring profile cache %s: %s", self.cache_file, e)
+            return {}
+
+    def _write(self):
+        if self.cache_file is None:
+            return
+        data = {"format": CACHE_FORMAT, "profiles": self.profiles}
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, mode="w", encoding="utf-8") as f:
+                json.dump(data, f, indent=1)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            logger.warning("Could not write profile cache %s: %s", self.cache_file, e)
+
+    def use_file(self, cache_file: str = DEFAULT_CACHE_FILE):
+        """Keep the profiles in a file between runs.
+
+        Args:
+            cache_file (str): The JSON file, None to only keep the profiles
+                in memory. Defaults to ~/.cache/pynanovna/profiles.json.
+        """
+        known = self._profiles or {}
+        self.cache_file = cache_file
+        self._profiles = None
+        self.profiles.update(known)
+
+    @staticmethod
+    def key(vna) -> str:
+        """Get the key of a driver, None if its device can't be identified."""
+        if vna.device_id:
+            identity = f"sn:{vna.device_id}"
+        elif usb_serial := getattr(vna.serial, "serial_number", None):
+            identity = f"usb:{usb_serial}"
+        else:
+            return None
+        return f"{vna.name}|{identity}|{vna.version}"
+
+    def load(self, vna) -> bool:
+        """Set the profile attributes of a driver from its cached profile.
+
+        Returns:
+            bool: If there was a profile.
+        """
+        if (key := self.key(vna)) is None or key not in self.profiles:
+            return False
+        for name, value in self.profiles[key].items():
+            setattr(vna, name, _DECODE.get(name, lambda v: v)(value))
+        logger.debug("Using cached profile %s", key)
+        return True
+
+    def save(self, vna):
+        """Cache the profile attributes of a driver."""
+        if (key := self.key(vna)) is None:
+            return
+        self.profiles[key] = {
+            name: _encode(getattr(vna, name))
+            for name in PROFILE_ATTRIBUTES
+            if hasattr(vna, name)
+        }
+        self._write()
+
+    def clear(self):
+        """Forget all profiles."""
+        self._profiles = {}
+        self._write()
+
+
+# Profiles of this process, profiles.use_file() keeps them between runs.
+profiles = ProfileCache()
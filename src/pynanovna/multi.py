@@ -0,0 +1,212 @@
+"""
+Synchronized acquisition from several NanoVNAs.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+from .hardware import Hardware as hw
+from .pynanovna import VNA
+from .sweep import Sweep
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("nearest", "wait_all", "latest")
+
+
+def _midpoint(sweep: Sweep) -> float:
+    return (sweep.start_time + sweep.end_time) / 2
+
+
+class MultiVNA:
+    def __init__(
+        self,
+        vnas: list[VNA] = None,
+        size: int = 8,
+        policy: str = "nearest",
+        logging_level: str = "info",
+    ):
+        """Sweep several VNAs at the same time and deliver aligned sweep sets.
+
+        Every device is swept by its own worker thread, so each runs at its
+        own pace and the total sweep rate grows with the number of devices.
+        Each worker keeps its last `size` sweeps.
+
+        Policies for combining the sweeps into sets:
+            "nearest": Wait for a new sweep from every device, then pick for
+                every device the sweep closest in time to the newest sweep of
+                the slowest device.
+            "wait_all": The next sweep of every device in order, no sweep is
+                skipped unless a buffer overflows.
+            "latest": The newest sweep of every device as soon as any device
+                has a sweep newer than the last set, a slow device may repeat
+                its sweep in consecutive sets.
+
+        Args:
+            vnas (list[VNA]): The VNAs. Defaults to opening every interface
+                from hardware.get_interfaces().
+            size (int): Number of sweeps kept per device. Defaults to 8.
+            policy (str): "nearest", "wait_all" or "latest". Defaults to "nearest".
+            logging_level (str): The level of outputs when opening the VNAs.
+
+        Raises:
+            ValueError: If the policy is invalid, or no VNA is connected.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}, not {policy!r}")
+        if vnas is None:
+            vnas = [
+                VNA(vna_index=index, logging_level=logging_level)
+                for index in range(len(hw.get_interfaces()))
+            ]
+            vnas = [vna for vna in vnas if vna.connected]
+        if not vnas:
+            raise ValueError("No connected VNA.")
+        self.vnas = vnas
+        self.size = size
+        self.policy = policy
+        # Sweeps dropped from a full buffer, per device.
+        self.overruns = [0] * len(vnas)
+        self._buffers = [deque() for _ in vnas]
+        self._latest = [None] * len(vnas)
+        # the last set returned by the "latest" policy
+        self._returned = [None] * len(vnas)
+        self._condition = threading.Condition()
+        self._running = False
+        self._error = None
+        self._threads = []
+
+    def __len__(self) -> int:
+        return len(self.vnas)
+
+    def set_sweep(self, start: float, stop: float, points: int):
+        """Set the same sweep on every VNA, see VNA.set_sweep."""
+        for vna in self.vnas:
+            vna.set_sweep(start, stop, points)
+
+    def start(self) -> "MultiVNA":
+        """Start sweeping every device in the background."""
+        if self._running:
+            return self
+        self._running = True
+        self._error = None
+        for buffer in self._buffers:
+            buffer.clear()
+        self._latest = [None] * len(self.vnas)
+        self._returned = [None] * len(self.vnas)
+        self._threads = [
+            threading.Thread(
+                target=self._run,
+                args=(index,),
+                name=f"pynanovna device {index}",
+                daemon=True,
+            )
+            for index in range(len(self.vnas))
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """Stop sweeping and wait for the workers to finish."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def __enter__(self) -> "MultiVNA":
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def kill(self):
+        """Stop sweeping and disconnect every VNA."""
+        self.stop()
+        for vna in self.vnas:
+            vna.kill()
+
+    def _run(self, index: int):
+        vna = self.vnas[index]
+        buffer = self._buffers[index]
+        try:
+            while self._running:
+                start_time = time.time()
+                sweep = vna._new_sweep(start_time, *vna.vna.read_sweep())
+                with self._condition:
+                    if len(buffer) == self.size:
+                        buffer.popleft()
+                        self.overruns[index] += 1
+                    buffer.append(sweep)
+                    self._latest[index] = sweep
+                    self._condition.notify_all()
+        except Exception as e:
+            logger.critical("Exception in device %d: %s", index, e, exc_info=True)
+            with self._condition:
+                self._error = e
+                self._running = False
+                self._condition.notify_all()
+
+    def _ready(self) -> bool:
+        """If there is a new set, call with the condition held."""
+        if self.policy == "latest":
+            return all(self._latest) and any(
+                sweep is not returned
+                for sweep, returned in zip(self._latest, self._returned)
+            )
+        return all(self._buffers)
+
+    def get(self, timeout: float = None) -> tuple[Sweep, ...]:
+        """Get the next set of sweeps, one per device, by the policy.
+
+        Args:
+            timeout (float): Seconds to wait. Defaults to None, wait until
+                there is a set.
+
+        Raises:
+            TimeoutError: If no set was complete in time.
+            RuntimeError: If the acquisition is stopped, or a device failed.
+
+        Returns:
+            tuple[Sweep, ...]: A sweep per device, in the order of `vnas`.
+        """
+        with self._condition:
+            if not self._condition.wait_for(
+                lambda: self._ready() or not self._running, timeout
+            ):
+                raise TimeoutError("Not every device delivered a sweep in time.")
+            if not self._ready() or (self.policy == "latest" and not self._running):
+                if self._error is not None:
+                    raise RuntimeError("A device failed.") from self._error
+                raise RuntimeError("Acquisition is not running.")
+            if self.policy == "latest":
+                self._returned = list(self._latest)
+                return tuple(self._latest)
+            if self.policy == "wait_all":
+                return tuple(buffer.popleft() for buffer in self._buffers)
+            anchor = min(_midpoint(buffer[-1]) for buffer in self._buffers)
+            sweeps = []
+            for buffer in self._buffers:
+                sweep = min(buffer, key=lambda s: abs(_midpoint(s) - anchor))
+                while buffer.popleft() is not sweep:
+                    pass
+                sweeps.append(sweep)
+            return tuple(sweeps)
+
+    def __iter__(self):
+        """Yield sweep sets until the acquisition is stopped."""
+        while True:
+            try:
+                yield self.get()
+            except RuntimeError:
+                if self._error is not None:
+                    raise
+                return
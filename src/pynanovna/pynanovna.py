@@ -3,11 +3,18 @@ Main module for the pynanovna package.
 """
 
 from .hardware import Hardware as hw
+from .hardware import discovery
 from .calibration import calibration
+from .calibration.library import CalibrationLibrary
+from .sweep import Sweep
+from .acquisition import Acquisition
 
 import logging
 import numpy as np
 import csv
+import time
+from collections.abc import Generator, Iterator
+from functools import partial
 
 
 class VNA:
@@ -27,7 +34,8 @@ class VNA:
         )
         logging.info("Initializing the VNA.")
         try:
-            self.iface = hw.get_interfaces()[vna_index]
+            self.device = discovery.discover()[vna_index]
+            self.iface = self.device.interface()
             self.iface.open()
             self.connected = True
         except IndexError:
@@ -35,11 +43,14 @@ class VNA:
             self.connected = False
             return
 
-        self.vna = hw.get_VNA(self.iface)
+        self.vna = hw.get_VNA(self.iface, self.device.variant)
         self.sweep_interval = (None, None)
         self.sweep_points = None
         self.calibration = calibration.Calibration()
-        self.offset_delay = 0
+        self.calibration_library = None
+        # the calibration selected from the library and its version then
+        self._library_calibration = None
+        self.sweep_count = 0
         logging.info("VNA successfully initialized.")
 
     def set_sweep(self, start: float, stop: float, points: int):
@@ -50,10 +61,20 @@ class VNA:
             stop (int): The stop frequency.
             points (int): Number of points in the sweep.
         """
+        self.vna.run(self.set_sweep_steps(start, stop, points))
+
+    def set_sweep_steps(self, start: float, stop: float, points: int) -> Generator:
+        """Transaction of set_sweep, to run it on another transport.
+
+        See VNABase.run and AsyncVNA.
+        """
         self.vna.datapoints = points
-        self.vna.set_sweep(start, stop)
+        yield from self.vna.set_sweep_steps(start, stop)
         self.sweep_interval = (start, stop)
         self.sweep_points = points
+        if self.calibration_library is not None:
+            self._select_calibration()
+        self._prepare_calibration()
         logging.debug(
             "Sweep has been set from "
             + str(self.sweep_interval[0] / 1e9)
@@ -68,58 +89,69 @@ class VNA:
     def sweep(
         self,
         overwrite_wait: float = 0.05,
-    ) -> tuple[list[complex], list[complex], list[int]]:
+        out: tuple[np.ndarray, np.ndarray] = None,
+    ) -> Sweep:
         """Run a single sweep and return the data.
 
         Args:
-            overwrite_wait: Do not change if you don't know what youre doing.
-                            This can be used to lower the wait in the hardware functions.
+            overwrite_wait: Deprecated, has no effect. Responses are read as
+                            soon as they are complete.
+            out (tuple): Two complex128 arrays with one value per point to write
+                the calibrated s11 and s21 into. Defaults to new arrays.
+
+        Raises:
+            ValueError: If out does not match the sweep.
 
         Returns:
-            tuple: s11, s21, frequencies
+            Sweep: The sweep, unpacks as s11, s21, frequencies.
         """
-        frequencies = np.array(self.vna.read_frequencies())
-        data0 = np.array(
-            [complex(*map(float, s.split())) for s in self.vna.read_values("data 0")]
-        )
-        data1 = np.array(
-            [complex(*map(float, s.split())) for s in self.vna.read_values("data 1")]
-        )
-        s11, s21 = self._apply_calibration(data0, data1, frequencies)
-        return s11, s21, frequencies
+        return self.vna.run(self.sweep_steps(out))
+
+    def sweep_steps(self, out: tuple[np.ndarray, np.ndarray] = None) -> Generator:
+        """Transaction of sweep, to run it on another transport.
+
+        See VNABase.run and AsyncVNA.
+        """
+        start_time = time.time()
+        data = yield from self.vna.read_sweep_steps()
+        sweep = self._new_sweep(start_time, *data, out)
+        if out is not None:
+            # fill out now, the caller reads the arrays rather than the sweep
+            sweep.calibrate()
+        return sweep
 
     def stream(
         self,
         overwrite_wait: float = 0.05,
-    ) -> tuple[list[complex], list[complex], list[int]]:
+        reuse_buffers: bool = False,
+    ) -> Sweep:
         """Creates a data stream from the continuous sweeping.
 
         Args:
-            overwrite_wait: Do not change if you don't know what youre doing.
-                            This can be used to lower the wait in the hardware functions.
+            overwrite_wait: Deprecated, has no effect. Responses are read as
+                            soon as they are complete.
+            reuse_buffers (bool): Write every sweep into the same s11 and s21
+                arrays instead of new ones. The arrays are overwritten by the
+                next sweep, so copy what you want to keep. Defaults to False.
 
         Yields:
-            tuple: Yields a list of data when new data is available. Each datapoint: (s11, s21, frequencies)
+            Sweep: Yields a sweep when new data is available, it unpacks as (s11, s21, frequencies).
         """
-        frequencies = np.array(self.vna.read_frequencies())
-        logging.debug("Frequencies read: %d values", len(frequencies))
         logging.debug("Starting stream.")
+        buffers = None
 
         while True:
             try:
-                raw_data0 = self.vna.read_values("data 0")
-                raw_data1 = self.vna.read_values("data 1")
-
-                data0 = np.array(
-                    [complex(*map(float, s.split())) for s in raw_data0]
-                ).copy()
-                data1 = np.array(
-                    [complex(*map(float, s.split())) for s in raw_data1]
-                ).copy()
+                start_time = time.time()
+                data0, data1, frequencies = self.vna.read_sweep()
 
-                s11, s21 = self._apply_calibration(data0, data1, frequencies)
+                if reuse_buffers and (buffers is None or len(buffers[0]) != len(data0)):
+                    buffers = (
+                        np.empty(len(data0), dtype=np.complex128),
+                        np.empty(len(data0), dtype=np.complex128),
+                    )
 
-                yield s11, s21, frequencies
+                yield self._new_sweep(start_time, data0, data1, frequencies, buffers)
 
             except KeyboardInterrupt:
                 logging.debug("KeyboardInterrupt in stream, killing loop.")
@@ -128,6 +160,52 @@ class VNA:
                 logging.critical("Exception in data stream: %s", e, exc_info=True)
                 break
 
+    def acquire(self, size: int = 8, policy: str = "drop_oldest") -> Acquisition:
+        """Sweep continuously in a background thread into a ring buffer.
+
+        Args:
+            size (int): Number of sweeps buffered. Defaults to 8.
+            policy (str): What to do when the consumer falls behind, "block",
+                "drop_oldest" or "latest". Defaults to "drop_oldest".
+
+        Returns:
+            Acquisition: The running acquisition, get sweeps with get() or by
+                iterating over it, and stop it with stop().
+        """
+        return Acquisition(self, size, policy).start()
+
+    def _new_sweep(
+        self,
+        start_time: float,
+        data0: np.ndarray,
+        data1: np.ndarray,
+        frequencies: np.ndarray,
+        out: tuple[np.ndarray, np.ndarray] = None,
+    ) -> Sweep:
+        """Wrap raw data in a Sweep, the calibration is applied on first use.
+
+        The sweep keeps the calibration in use now. The VNA replaces its
+        calibration rather than changing it, so a sweep read later is still
+        corrected with the calibration it was taken with.
+        """
+        self.sweep_count += 1
+        return Sweep(
+            data0,
+            data1,
+            frequencies,
+            partial(
+                self._apply_calibration,
+                data0,
+                data1,
+                frequencies,
+                out,
+                self.calibration,
+            ),
+            self.sweep_count,
+            start_time,
+            time.time(),
+        )
+
     def stream_to_csv(
         self,
         filename: str,
@@ -190,6 +268,7 @@ class VNA:
             )
         assert step in ["short", "open", "load", "isolation", "through"]
         s11, s21, frequencies = self.sweep()
+        self._change_calibration()
         self.calibration.calibration_step(step, s11, s21, frequencies)
         if step == "through":
             logging.debug("Running through step. Here thrurefl is also run.")
@@ -204,6 +283,7 @@ class VNA:
         Raises:
             Exception: If the calibration is not successfully calculated.
         """
+        self._change_calibration()
         self.calibration.cal_element.short_is_ideal = True
         self.calibration.cal_element.open_is_ideal = True
         self.calibration.cal_element.load_is_ideal = True
@@ -211,6 +291,7 @@ class VNA:
 
         try:
             self.calibration.calc_corrections()
+            self._prepare_calibration()
             logging.info("Calibration successfully enabled.")
         except ValueError as e:
             raise Exception(
@@ -221,7 +302,8 @@ class VNA:
         """Save the current calibration.
 
         Args:
-            filename (str): The filename for the calibration.
+            filename (str): The filename for the calibration. Use the `.npz`
+                extension to save in the faster binary format.
         """
         if not self.calibration.isCalculated:
             raise Exception("Cannot save an unapplied calibration state.")
@@ -235,42 +317,105 @@ class VNA:
     def load_calibration(self, filename: str):
         """Load a previous calibration from a file.
 
+        Both text `.cal` files and binary `.npz` files are supported, the
+        format is detected automatically. Binary files that contain the
+        solved error terms are used as they are.
+
         Args:
             filename (str): The file containing the previous calibration.
         """
         if filename:
-            self.calibration.load(filename)
+            cal = calibration.Calibration()
+            cal.load(filename)
+            cal.use_port_extension(self.calibration.port_extension)
+            self.calibration = cal
         if not self.calibration.is_valid_1_port():
             raise Exception("Not a valid port.")
 
-        for i, name in enumerate(
-            ("short", "open", "load", "through", "isolation", "thrurefl")
-        ):
-            if i == 2 and not self.calibration.is_valid_2_port():
-                break
-        self.calibrate()
+        if self.calibration.isCalculated:
+            self._prepare_calibration()
+            logging.info("Calibration successfully enabled.")
+        else:
+            self.calibrate()
+
+    def use_calibration_library(self, library: CalibrationLibrary):
+        """Automatically load calibrations from a library on every set_sweep.
+
+        Args:
+            library (CalibrationLibrary): The library, or None to stop using one.
+        """
+        self.calibration_library = library
+        if library is not None and self.sweep_points is not None:
+            self._select_calibration()
+            self._prepare_calibration()
+
+    def _select_calibration(self):
+        """Switch to the library calibration matching this device and sweep.
+
+        Without a match a calibration the user loaded or measured is kept,
+        an unchanged one from the library for another sweep is dropped.
+        """
+        start, stop = self.sweep_interval
+        cal = self.calibration_library.get(self.vna.SN, start, stop, self.sweep_points)
+        if cal is None:
+            from_library = self._library_calibration == (
+                self.calibration,
+                self.calibration.version,
+            )
+            logging.warning(
+                "No calibration in the library for %s from %s to %s with %s points, %s.",
+                self.vna.SN,
+                start,
+                stop,
+                self.sweep_points,
+                "sweeping uncalibrated" if from_library else "keeping the current one",
+            )
+            if not from_library:
+                return
+            cal = calibration.Calibration()
+        if cal.port_extension != self.calibration.port_extension:
+            cal.use_port_extension(self.calibration.port_extension)
+        self.calibration = cal
+        self._library_calibration = (cal, cal.version)
 
     def _apply_calibration(
         self,
-        raw_s11: list[complex],
-        raw_s21: list[complex],
-        frequencies: list[int],
-    ) -> tuple[list[complex]]:
+        raw_s11: np.ndarray,
+        raw_s21: np.ndarray,
+        frequencies: np.ndarray,
+        out: tuple[np.ndarray, np.ndarray] = None,
+        cal: calibration.Calibration = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
         """Apply calibration to raw data.
 
         Args:
             raw_s11 (np.array): s11 data.
             raw_s21 (np.array): s21 data.
+            frequencies (np.array): Frequencies of the sweep.
+            out (tuple): Two complex128 arrays to write the result into.
+                Defaults to new arrays.
+            cal (Calibration): The calibration. Defaults to the current one.
+
+        Raises:
+            ValueError: If out does not match the data.
 
         Returns:
             tuple: calibrated s-parameter data.
         """
-        s11 = raw_s11.copy()
-        s21 = raw_s21.copy()
+        raw_s11 = np.asarray(raw_s11, dtype=np.complex128)
+        raw_s21 = np.asarray(raw_s21, dtype=np.complex128)
+        if out is None:
+            out = (np.empty_like(raw_s11), np.empty_like(raw_s21))
+        elif any(a.dtype != np.complex128 or a.shape != raw_s11.shape for a in out):
+            raise ValueError(
+                f"out must be two complex128 arrays of shape {raw_s11.shape}."
+            )
 
-        is_calculated = self.calibration.isCalculated
-        is_valid_1port = self.calibration.is_valid_1_port()
-        is_valid_2port = self.calibration.is_valid_2_port()
+        if cal is None:
+            cal = self.calibration
+        is_calculated = cal.isCalculated
+        is_valid_1port = cal.is_valid_1_port()
+        is_valid_2port = cal.is_valid_2_port()
 
         if not is_calculated:
             logging.critical(
@@ -278,41 +423,20 @@ class VNA:
             )
 
         if is_calculated and is_valid_1port:
-            s11 = [
-                self.calibration.correct11(datapoint, frequencies[i])
-                for i, datapoint in enumerate(raw_s11)
-            ]
+            s11, s21 = cal.apply(raw_s11, raw_s21, frequencies, out)
         else:
             logging.critical(
                 "1 port calibration not valid, it is recommended to re-calibrate."
             )
+            s11, s21 = raw_s11, raw_s21
 
-        if is_valid_2port:
-            s21 = [
-                self.calibration.correct21(datapoint, raw_s11[i], frequencies[i])
-                for i, datapoint in enumerate(raw_s21)
-            ]
-        else:
+        if not is_valid_2port:
             logging.critical(
                 "2 port calibration not valid, it is recommended to re-calibrate."
             )
 
-        # Apply offset delay if needed.
-        if self.offset_delay != 0:
-            s11 = [
-                self.calibration.correct_delay(
-                    datapoint, frequencies[i], self.offset_delay, reflect=True
-                )
-                for i, datapoint in enumerate(s11)
-            ]
-            s21 = [
-                self.calibration.correct_delay(
-                    datapoint, frequencies[i], self.offset_delay
-                )
-                for i, datapoint in enumerate(s21)
-            ]
-
-        return s11, s21
+        # Apply offset delay and port extension if needed.
+        return cal.apply_port_extension(s11, s21, frequencies, out)
 
     def set_offset_delay(self, delay: float):
         """Manually set offset delay. This is used in calibration.
@@ -320,11 +444,89 @@ class VNA:
         Args:
             delay (float): The delay.
         """
-        self.offset_delay = delay
+        self._change_calibration().set_offset_delay(delay)
+
+    def set_port_extension(self, port: int, delay: float, loss: float = 0.0):
+        """Set the port extension of one port, replacing the offset delay.
+
+        Args:
+            port (int): 1 or 2.
+            delay (float): One way delay in seconds.
+            loss (float): One way loss in dB. Defaults to 0.
+        """
+        self._change_calibration().set_port_extension(port, delay, loss)
+
+    def _change_calibration(self) -> calibration.Calibration:
+        """Replace the calibration by a copy to change.
+
+        Sweeps taken so far keep the calibration they were taken with.
+        """
+        self.calibration = self.calibration.copy()
+        return self.calibration
+
+    @property
+    def offset_delay(self) -> float:
+        return self.calibration.offset_delay
+
+    def _prepare_calibration(self):
+        """Cache the calibration error terms for the current sweep grid.
+
+        Only done if the driver knows the grid without asking the device,
+        e.g. the NanoVNA V2. For other devices the grid comes with the first
+        sweep, which prepares the calibration when it is applied.
+        """
+        if self.sweep_points is None:
+            return
+        is_calculated = self.calibration.isCalculated
+        is_extended = self.calibration.port_extension.is_active()
+        if not (is_calculated or is_extended):
+            return
+        frequencies = self.vna.sweep_frequencies(read=False)
+        if frequencies is None:
+            return
+        if is_calculated:
+            self.calibration.prepare(frequencies)
+        if is_extended:
+            self.calibration.port_extension_factors(frequencies)
+
+    def set_averaging(self, n: int, spread: bool = False):
+        """Average n measurements per frequency in the NanoVNA V2.
+
+        All n values of a sweep are read at once and averaged per point,
+        which is much faster than averaging n sweeps.
+
+        Args:
+            n (int): Values per frequency, 1 to turn averaging off.
+            spread (bool): Keep the standard deviation of each point of the
+                last sweep in `self.vna.spread`. Defaults to False.
+
+        Raises:
+            ValueError: If the device does not support hardware averaging.
+        """
+        if not hasattr(self.vna, "set_averaging"):
+            raise ValueError(f"{self.vna.name} does not support hardware averaging.")
+        self.vna.set_averaging(n, spread)
+
+    def raw_samples(self, records: int = 255) -> Iterator[np.ndarray]:
+        """Stream raw ADC samples of the NanoVNA V2, see NanoVNA_V2.raw_samples.
+
+        Args:
+            records (int): FIFO records per chunk, each holds 16 samples.
+
+        Raises:
+            ValueError: If the device does not support raw samples.
+
+        Returns:
+            Iterator[np.ndarray]: int16 samples, in a buffer reused for every chunk.
+        """
+        if not hasattr(self.vna, "raw_samples"):
+            raise ValueError(f"{self.vna.name} does not support raw samples.")
+        return self.vna.raw_samples(records)
 
     def set_vna_wait(self, wait: float):
-        """There is a small sleep time in the communication with the NanoVNA, which is needed.
-            You can change the sleep time in order to speed up the communication.
+        """Set the sleep time after configuring a NanoVNA V2 and when reconnecting.
+            Text protocol commands wait for their response instead of sleeping,
+            so this does not change how fast they are.
             Beware of unexpected errors if setting this to lower than 0.05.
 
         Args:
@@ -343,6 +545,9 @@ class VNA:
     def info(self) -> dict:
         """Get info about your NanoVNA and the connection to it.
 
+        The info is read when connecting, or taken from the cached profile
+        of the device, so this does not talk to the device.
+
         Returns:
             dict: A dictionary with the info.
         """
@@ -355,8 +560,8 @@ class VNA:
             "Valid Datapoints": self.vna.valid_datapoints,
             "Minimum Sweep Points": self.vna.sweep_points_min,
             "Interface": str(self.iface),
-            "Info": hw.get_info(self.iface),
-            "Comment": hw.get_comment(self.iface),
+            "Info": self.vna.firmware_info,
+            "Comment": self.device.variant,
         }
         return specifications
 
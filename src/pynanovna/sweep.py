@@ -0,0 +1,167 @@
+"""
+The result of a single sweep.
+"""
+
+from typing import Callable
+
+import numpy as np
+
+
+class Sweep:
+    """One sweep of raw data, calibrated and derived values on demand.
+
+    The calibration is only applied the first time s11 or s21 is read, and
+    derived values such as dB, phase and impedance are computed on first
+    access. Both are then cached, so consumers of the raw data never pay for
+    them.
+
+    A Sweep still unpacks and indexes like the (s11, s21, frequencies) tuple
+    returned before, so `s11, s21, frequencies = vna.sweep()` works as is.
+    """
+
+    __slots__ = (
+        "raw_s11",
+        "raw_s21",
+        "frequencies",
+        "sequence",
+        "start_time",
+        "end_time",
+        "_calibrate",
+        "_s11",
+        "_s21",
+        "_derived",
+    )
+
+    def __init__(
+        self,
+        raw_s11: np.ndarray,
+        raw_s21: np.ndarray,
+        frequencies: np.ndarray,
+        calibrate: Callable[[], tuple[np.ndarray, np.ndarray]] = None,
+        sequence: int = 0,
+        start_time: float = None,
+        end_time: float = None,
+    ):
+        """
+        Args:
+            raw_s11 (np.ndarray): Raw s11 data, complex128.
+            raw_s21 (np.ndarray): Raw s21 data, complex128.
+            frequencies (np.ndarray): Frequencies of the sweep in Hz.
+            calibrate (Callable): Called without arguments on first access
+                to get the calibrated (s11, s21). Defaults to None, then the
+                raw data is used.
+            sequence (int): Number of the sweep in its stream. Defaults to 0.
+            start_time (float): time.time() when the sweep was started.
+            end_time (float): time.time() when the data was read.
+        """
+        self.raw_s11 = raw_s11
+        self.raw_s21 = raw_s21
+        self.frequencies = frequencies
+        self.sequence = sequence
+        self.start_time = start_time
+        self.end_time = end_time
+        self._calibrate = calibrate
+        self._s11 = None
+        self._s21 = None
+        self._derived = {}
+
+    def calibrate(self) -> "Sweep":
+        """Apply the calibration now instead of on first access.
+
+        Returns:
+            Sweep: This sweep.
+        """
+        if self._s11 is None:
+            if self._calibrate is None:
+                self._s11, self._s21 = self.raw_s11, self.raw_s21
+            else:
+                self._s11, self._s21 = self._calibrate()
+            self._calibrate = None
+        return self
+
+    @property
+    def s11(self) -> np.ndarray:
+        """Calibrated s11."""
+        self.calibrate()
+        return self._s11
+
+    @property
+    def s21(self) -> np.ndarray:
+        """Calibrated s21."""
+        self.calibrate()
+        return self._s21
+
+    @property
+    def calibrated(self) -> bool:
+        """If the calibration has been applied yet."""
+        return self._s11 is not None
+
+    def _derive(self, name: str, function: Callable[[], np.ndarray]) -> np.ndarray:
+        if (value := self._derived.get(name)) is None:
+            value = self._derived[name] = function()
+        return value
+
+    @property
+    def s11_db(self) -> np.ndarray:
+        """Magnitude of s11 in dB."""
+        return self._derive("s11_db", lambda: 20 * np.log10(np.abs(self.s11)))
+
+    @property
+    def s21_db(self) -> np.ndarray:
+        """Magnitude of s21 in dB."""
+        return self._derive("s21_db", lambda: 20 * np.log10(np.abs(self.s21)))
+
+    @property
+    def s11_phase(self) -> np.ndarray:
+        """Phase of s11 in radians."""
+        return self._derive("s11_phase", lambda: np.angle(self.s11))
+
+    @property
+    def s21_phase(self) -> np.ndarray:
+        """Phase of s21 in radians."""
+        return self._derive("s21_phase", lambda: np.angle(self.s21))
+
+    @property
+    def vswr(self) -> np.ndarray:
+        """Voltage standing wave ratio at port 1."""
+
+        def vswr():
+            gamma = np.abs(self.s11)
+            return (1 + gamma) / (1 - gamma)
+
+        return self._derive("vswr", vswr)
+
+    def impedance(self, z0: float = 50.0) -> np.ndarray:
+        """Impedance seen at port 1.
+
+        Args:
+            z0 (float): Reference impedance in ohm. Defaults to 50.
+
+        Returns:
+            np.ndarray: Complex impedance in ohm.
+        """
+        return self._derive(
+            f"impedance {z0}", lambda: z0 * (1 + self.s11) / (1 - self.s11)
+        )
+
+    @property
+    def duration(self) -> float:
+        """Seconds from the start of the sweep until its data was read."""
+        return self.end_time - self.start_time
+
+    def __len__(self) -> int:
+        return 3
+
+    def __iter__(self):
+        yield self.s11
+        yield self.s21
+        yield self.frequencies
+
+    def __getitem__(self, index):
+        return (self.s11, self.s21, self.frequencies)[index]
+
+    def __repr__(self) -> str:
+        return (
+            f"Sweep(sequence={self.sequence}, points={len(self.frequencies)}, "
+            f"calibrated={self.calibrated})"
+        )
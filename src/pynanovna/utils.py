@@ -6,6 +6,7 @@ import logging
 import time
 import numpy as np
 from .hardware import Hardware as hw
+from .hardware import discovery
 
 
 def stream_from_csv(
@@ -65,6 +66,21 @@ def get_interfaces() -> object:
     return hw.get_interfaces()
 
 
+def discover(refresh: bool = False) -> list:
+    """Find the connected devices and their firmware variant.
+
+    New ports are probed at the same time, known devices are read from a
+    cache in ~/.cache/pynanovna.
+
+    Args:
+        refresh (bool): Probe every port, even if it is cached.
+
+    Returns:
+        list: DeviceDescriptor (port, vid, pid, usb_serial, typename, variant)
+    """
+    return discovery.discover(refresh=refresh)
+
+
 def get_portinfos() -> list[str]:
     """This function is DEPRECATED and will be removed in v2.0.
         Get information about communication ports.
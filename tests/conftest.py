@@ -0,0 +1,283 @@
+import threading
+import time
+from struct import pack
+from typing import Union
+
+import numpy as np
+import pytest
+
+import pynanovna
+from pynanovna.calibration.calibration import Calibration
+
+
+class FakeNanoVNA:
+    """Serial port stand-in answering the text protocol of a NanoVNA-H4."""
+
+    def __init__(
+        self,
+        version: str = "1.2.20",
+        binary: bool = False,
+        sn: str = None,
+        board: str = "NanoVNA-H 4",
+    ):
+        self.lock = threading.Lock()
+        self.timeout = 0.05
+        self.is_open = True
+        self.version = version
+        self.board = board
+        self.binary = binary
+        self.sn = sn
+        self.commands = []
+        self.start, self.stop, self.points = 50000, 900000000, 101
+        self._input = b""
+        self._output = bytearray()
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self._output)
+
+    def s11(self, frequencies: np.ndarray) -> np.ndarray:
+        return frequencies / 1e9 + 0.5j
+
+    def s21(self, frequencies: np.ndarray) -> np.ndarray:
+        return 0.25 - frequencies / 2e9 * 1j
+
+    def frequencies(self) -> np.ndarray:
+        step = (self.stop - self.start) // (self.points - 1)
+        return self.start + step * np.arange(self.points, dtype=np.int64)
+
+    def _respond(self, command: str) -> Union[list[str], bytes]:
+        args = command.split()
+        if not args:
+            return []
+        if args[0] == "info":
+            return [f"Board: {self.board}", f"Version: {self.version}"]
+        if args[0] == "version":
+            return [self.version]
+        if args[0] == "sn":
+            # firmware without the command answers like for any unknown one
+            return [self.sn or "sn?"]
+        if args[0] == "help":
+            commands = "help version scan data frequencies sweep"
+            return [f"Commands: {commands}" + (" sn:" if self.sn else "")]
+        if args[0] == "frequencies":
+            return [str(f) for f in self.frequencies()]
+        if args[0] == "data":
+            values = (self.s11 if args[1] == "0" else self.s21)(self.frequencies())
+            return [f"{x.real} {x.imag}" for x in values.tolist()]
+        if args[0] in ("scan", "sweep") and len(args) > 3:
+            self.start, self.stop, self.points = map(int, map(float, args[1:4]))
+        if args[0] == "scan" and len(args) > 4:
+            mask = int(args[4], 0)
+            f = self.frequencies()
+            if self.binary and mask & 0b10000000:
+                return self._binary_scan(mask, f)
+            columns = []
+            if mask & 0b001:
+                columns.append([str(x) for x in f.tolist()])
+            for bit, values in ((0b010, self.s11(f)), (0b100, self.s21(f))):
+                if mask & bit:
+                    columns.append([f"{x.real} {x.imag}" for x in values.tolist()])
+            return [" ".join(row) for row in zip(*columns)]
+        return []
+
+    def _binary_scan(self, mask: int, f: np.ndarray) -> bytes:
+        data = pack("<HH", mask, len(f))
+        for i, (s11, s21) in enumerate(zip(self.s11(f), self.s21(f))):
+            if mask & 0b001:
+                data += pack("<I", f[i])
+            if mask & 0b010:
+                data += pack("<ff", s11.real, s11.imag)
+            if mask & 0b100:
+                data += pack("<ff", s21.real, s21.imag)
+        return data
+
+    def write(self, data: bytes) -> int:
+        self._input += data
+        while b"\r" in self._input:
+            line, self._input = self._input.split(b"\r", 1)
+            command = line.decode("ascii")
+            self.commands.append(command)
+            self._output += f"{command}\r\n".encode("ascii")
+            response = self._respond(command)
+            if isinstance(response, bytes):
+                self._output += response
+            else:
+                self._output += "".join(f"{x}\r\n" for x in response).encode("ascii")
+            self._output += b"ch> "
+        return len(data)
+
+    def read(self, size: int = 1) -> bytes:
+        data = bytes(self._output[:size])
+        del self._output[:size]
+        return data
+
+    def readline(self) -> bytes:
+        end = self._output.find(b"\n") + 1 or len(self._output)
+        return self.read(end)
+
+    def read_until(self, expected: bytes = b"\n", size: int = None) -> bytes:
+        end = self._output.find(expected)
+        end = len(self._output) if end < 0 else end + len(expected)
+        return self.read(end if size is None else min(end, size))
+
+    def reset_input_buffer(self):
+        self._output.clear()
+
+    def reset_output_buffer(self):
+        pass
+
+
+class FakeNanoVNA_V2:
+    """Serial port stand-in answering the binary protocol of a NanoVNA V2."""
+
+    # opcode: (size of the command, size of the value)
+    COMMANDS = {0x00: (1, 0), 0x10: (2, 0), 0x18: (3, 0), 0x20: (3, 1)}
+    COMMANDS.update({0x21: (4, 2), 0x22: (6, 4), 0x23: (10, 8)})
+
+    def __init__(self, missed_reads: int = 0):
+        self.lock = threading.Lock()
+        self.timeout = 0.05
+        self.is_open = True
+        self.fd = None
+        # register reads that are not answered, like after connecting
+        self.missed_reads = missed_reads
+        self.writes = []
+        self.registers = {0x20: 101, 0x22: 1, 0xF0: 2, 0xF2: 4, 0xF3: 1, 0xF4: 3}
+        self.fifo = bytearray()
+        self.raw_count = 0
+        self._input = b""
+        self._output = bytearray()
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self._output)
+
+    def record(self, index: int, repeat: int) -> bytes:
+        """FIFO record of a point, s11 = (index + repeat) / 100 + 0.5j."""
+        s11 = (index + repeat, 50)
+        return pack("<iiiiiihxxxxxx", 100, 0, *s11, -index, 25, index)
+
+    def _clear_fifo(self):
+        points = self.registers[0x20]
+        self.fifo = bytearray(
+            b"".join(
+                self.record(index, repeat)
+                for index in range(points)
+                for repeat in range(self.registers[0x22])
+            )
+        )
+
+    def write(self, data: bytes) -> int:
+        self.writes.append(bytes(data))
+        self._input += data
+        while self._input:
+            opcode = self._input[0]
+            size, value_size = self.COMMANDS[opcode]
+            if len(self._input) < size:
+                break
+            command, self._input = self._input[:size], self._input[size:]
+            if opcode == 0x10:
+                if self.missed_reads:
+                    self.missed_reads -= 1
+                else:
+                    self._output.append(self.registers.get(command[1], 0))
+            elif opcode == 0x18 and self.registers.get(0x26):
+                # raw samples mode, a counting signal
+                count = command[2] * 16
+                samples = np.arange(self.raw_count, self.raw_count + count)
+                self._output += samples.astype("<i2").tobytes()
+                self.raw_count += count
+            elif opcode == 0x18:
+                size = command[2] * 32
+                self._output += self.fifo[:size]
+                del self.fifo[:size]
+            elif value_size:
+                value = int.from_bytes(command[2:], "little")
+                self.registers[command[1]] = value
+                if command[1] == 0x30:
+                    self._clear_fifo()
+        return len(data)
+
+    def read(self, size: int = 1) -> bytes:
+        data = bytes(self._output[:size])
+        del self._output[:size]
+        return data
+
+    def readinto(self, buffer: memoryview) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def reset_input_buffer(self):
+        self._output.clear()
+
+
+class FakeDriver:
+    """Driver stand-in returning sweeps numbered by their count."""
+
+    def __init__(self, points: int = 11, delay: float = 0.001, fail_after: int = None):
+        self.frequencies = np.arange(points, dtype=np.int64)
+        self.delay = delay
+        self.fail_after = fail_after
+        self.count = 0
+
+    def run(self, transaction):
+        """Run a transaction that does no I/O, see VNABase.run."""
+        try:
+            step = next(transaction)
+        except StopIteration as done:
+            return done.value
+        raise AssertionError(f"Unexpected I/O step: {step}")
+
+    def read_sweep(self):
+        return self.run(self.read_sweep_steps())
+
+    def read_sweep_steps(self):
+        time.sleep(self.delay)
+        self.count += 1
+        if self.fail_after is not None and self.count > self.fail_after:
+            raise IOError("device gone")
+        data = np.full(len(self.frequencies), self.count, dtype=np.complex128)
+        return data, -data, self.frequencies
+        yield
+
+
+@pytest.fixture
+def make_fake():
+    """Fixture making fake serial devices of a NanoVNA-H4, see FakeNanoVNA."""
+    return FakeNanoVNA
+
+
+@pytest.fixture
+def make_fake_v2():
+    """Fixture making fake serial devices of a NanoVNA V2, see FakeNanoVNA_V2."""
+    return FakeNanoVNA_V2
+
+
+@pytest.fixture
+def make_driver():
+    """Fixture making fake drivers, see FakeDriver."""
+    return FakeDriver
+
+
+@pytest.fixture
+def make_vna():
+    """Fixture making VNA objects around a driver, without connecting."""
+
+    def make_vna(driver) -> pynanovna.VNA:
+        vna = pynanovna.VNA.__new__(pynanovna.VNA)
+        vna.vna = driver
+        vna.calibration = Calibration()
+        vna.calibration_library = None
+        vna._library_calibration = None
+        vna.sweep_count = 0
+        return vna
+
+    return make_vna
+
+
+@pytest.fixture
+def fake(make_fake):
+    """Fixture with a fake serial device."""
+    return make_fake()
@@ -0,0 +1,53 @@
+import time
+
+import numpy as np
+import pytest
+
+from pynanovna.acquisition import Acquisition
+
+
+@pytest.fixture
+def vna(make_vna, make_driver):
+    """Fixture with a VNA object around a fake driver."""
+    return make_vna(make_driver())
+
+
+def test_acquisition_block(vna):
+    """Test that blocking acquisition hands over every sweep in order."""
+    with Acquisition(vna, size=2, policy="block") as acquisition:
+        sequences = []
+        for sweep in acquisition:
+            time.sleep(0.005)
+            assert np.all(sweep.raw_s11 == sweep.sequence)
+            assert np.all(sweep.s21 == -sweep.sequence)
+            sequences.append(sweep.sequence)
+            if len(sequences) == 10:
+                break
+    assert sequences == list(range(1, 11))
+    assert acquisition.overruns > 0
+    assert not acquisition.running
+
+
+def test_acquisition_latest(vna):
+    """Test that only the newest sweep is kept and drops are counted."""
+    acquisition = vna.acquire(size=4, policy="latest")
+    first = acquisition.get(timeout=1.0)
+    time.sleep(0.05)
+    second = acquisition.get(timeout=1.0)
+    acquisition.stop()
+    assert second.sequence > first.sequence + 1
+    assert acquisition.overruns >= second.sequence - first.sequence - 1
+    assert np.all(second.raw_s11 == second.sequence)
+
+
+def test_acquisition_errors(vna):
+    """Test that buffered sweeps are delivered before a device error."""
+    vna.vna.fail_after = 2
+    acquisition = Acquisition(vna, size=4, policy="drop_oldest").start()
+    assert acquisition.get(timeout=1.0).sequence == 1
+    assert acquisition.get(timeout=1.0).sequence == 2
+    with pytest.raises(RuntimeError):
+        acquisition.get(timeout=1.0)
+    assert isinstance(acquisition._error, IOError)
+    with pytest.raises(ValueError):
+        Acquisition(vna, policy="newest")
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+import pynanovna
+from pynanovna.hardware import NanoVNA_V2 as V2
+from pynanovna.hardware.NanoVNA_H4 import NanoVNA_H4
+
+
+@pytest.fixture
+def async_vna(make_vna):
+    """Fixture making AsyncVNA objects talking to a fake serial device."""
+    return lambda fake: pynanovna.AsyncVNA(make_vna(NanoVNA_H4(fake)))
+
+
+def test_async_sweep(async_vna, make_fake):
+    """Test sweeping two devices from one event loop."""
+    fakes = [make_fake(), make_fake(binary=True)]
+    vnas = [async_vna(fake) for fake in fakes]
+
+    async def run():
+        await asyncio.gather(*(vna.set_sweep(1e6, 51e6, 51) for vna in vnas))
+        return await asyncio.gather(*(vna.sweep() for vna in vnas))
+
+    for fake, (s11, s21, frequencies) in zip(fakes, asyncio.run(run())):
+        assert np.array_equal(frequencies, fake.frequencies())
+        assert np.allclose(s11, fake.s11(frequencies), atol=1e-6)
+        assert np.allclose(s21, fake.s21(frequencies), atol=1e-6)
+    assert fakes[1].commands[-1] == "scan 1000000.0 51000000.0 51 0b10000111"
+
+
+def test_async_stream(async_vna, make_fake):
+    """Test streaming with the frequencies only read by the first sweep."""
+    fake = make_fake(version="0.1.0")
+    vna = async_vna(fake)
+    vna.device.sweep_method = "sweep"
+
+    async def run():
+        await vna.set_sweep(1e6, 101e6, 101)
+        sweeps = []
+        async for sweep in vna.stream():
+            sweeps.append(sweep)
+            if len(sweeps) == 3:
+                return sweeps
+
+    sweeps = asyncio.run(run())
+    assert [sweep.sequence for sweep in sweeps] == [1, 2, 3]
+    assert np.allclose(sweeps[2].s11, fake.s11(fake.frequencies()))
+    assert fake.commands.count("frequencies") == 2
+    assert fake.commands[-2:] == ["data 0", "data 1"]
+
+
+def test_async_sweep_v2(make_vna, make_fake_v2, monkeypatch):
+    """Test that the V2 binary protocol runs the driver transactions too."""
+    monkeypatch.setattr(V2.tty, "setraw", lambda fd: None)
+    fake = make_fake_v2()
+    vna = pynanovna.AsyncVNA(make_vna(V2.NanoVNA_V2(fake)))
+
+    async def run():
+        await vna.set_sweep(1e6, 51e6, 51)
+        return await vna.sweep()
+
+    s11, s21, frequencies = asyncio.run(run())
+    assert frequencies[0] == 1e6 and frequencies[-1] == 51e6
+    assert np.allclose(s11, np.arange(51) / 100 + 0.5j)
+    assert np.allclose(s21, -np.arange(51) / 100 + 0.25j)
+    assert fake.registers[0x20] == 51
+
+
+def test_async_lock_in_loop(async_vna, make_fake):
+    """Test that an AsyncVNA made in a thread without event loop is usable."""
+    made = []
+    thread = threading.Thread(target=lambda: made.append(async_vna(make_fake())))
+    thread.start()
+    thread.join()
+    (vna,) = made
+    assert vna.port._lock is None
+    assert asyncio.run(vna.exec_raw("sn")).strip() == b"sn?"
@@ -0,0 +1,327 @@
+import pytest
+import numpy as np
+from pynanovna.calibration import calibration
+
+
+def _measure(s, e00, e11, delta_e):
+    """Raw reflection seen through the given 1 port error terms."""
+    return (e00 - s * delta_e) / (1 - s * e11)
+
+
+@pytest.fixture
+def cal():
+    """Fixture with a solved 2 port calibration on a synthetic error model."""
+    frequencies = np.linspace(1e9, 2e9, 101).astype(np.int64)
+    x = np.linspace(0, 1, len(frequencies))
+    e00 = 0.1 + 0.05j * x
+    e11 = 0.05 - 0.02j * x
+    e10e01 = 0.9 * np.exp(-1j * x)
+    delta_e = e00 * e11 - e10e01
+    c = calibration.Calibration()
+    c.insert("short", _measure(-1, e00, e11, delta_e), frequencies)
+    c.insert("open", _measure(1, e00, e11, delta_e), frequencies)
+    c.insert("load", _measure(0, e00, e11, delta_e), frequencies)
+    c.insert("isolation", np.full(len(frequencies), 0.001 + 0.001j), frequencies)
+    c.insert("through", 0.8 * np.exp(-2j * x) + 0.001 + 0.001j, frequencies)
+    c.insert("thrurefl", _measure(0, e00, e11, delta_e) + 0.01, frequencies)
+    c.calc_corrections()
+    c.model = (frequencies, e00, e11, delta_e)
+    return c
+
+
+def test_apply_recovers_dut(cal):
+    """Test that the whole-sweep correction removes the error model."""
+    frequencies, e00, e11, delta_e = cal.model
+    dut = 0.3 * np.exp(1j * np.linspace(0, 3, len(frequencies)))
+    s11, _ = cal.apply(_measure(dut, e00, e11, delta_e), dut, frequencies)
+    assert np.allclose(s11, dut)
+
+
+def test_apply_matches_pointwise(cal):
+    """Test that apply agrees with correct11 and correct21 between cal points."""
+    frequencies = np.linspace(0.9e9, 2.1e9, 257)
+    rng = np.random.default_rng(0)
+    raw_s11 = rng.normal(size=257) + 1j * rng.normal(size=257)
+    raw_s21 = rng.normal(size=257) + 1j * rng.normal(size=257)
+    s11, s21 = cal.apply(raw_s11, raw_s21, frequencies)
+    for i, f in enumerate(frequencies):
+        assert np.isclose(s11[i], cal.correct11(raw_s11[i], f))
+        assert np.isclose(s21[i], cal.correct21(raw_s21[i], raw_s11[i], f))
+
+
+def test_apply_out(cal):
+    """Test writing the corrected data into given arrays, also in place."""
+    frequencies = cal.model[0]
+    cal.set_offset_delay(1e-10)
+    rng = np.random.default_rng(1)
+    raw = rng.normal(size=(2, 101)) + 1j * rng.normal(size=(2, 101))
+    s11, s21 = cal.apply_port_extension(*cal.apply(*raw, frequencies), frequencies)
+    out = (np.empty(101, dtype=complex), np.empty(101, dtype=complex))
+    result = cal.apply(*raw, frequencies, out)
+    assert cal.apply_port_extension(*result, frequencies, out) is out
+    assert np.allclose(out, (s11, s21))
+    factor11, factor21 = cal.port_extension_factors(frequencies)
+    cal.apply(raw[0], raw[1], frequencies, (raw[0], raw[1]))
+    assert np.allclose(raw, (s11 / factor11, s21 / factor21))
+
+
+def test_apply_requires_calculation():
+    """Test that an unsolved calibration cannot be applied."""
+    with pytest.raises(ValueError):
+        calibration.Calibration().apply([0j], [0j], [1e9])
+
+
+def test_prepare_cache(cal):
+    """Test that the error terms are cached per grid and invalidated."""
+    frequencies = cal.model[0]
+    terms = cal.prepare(frequencies)
+    assert cal.prepare(frequencies.copy()) is terms
+    assert cal.prepare(frequencies[:-1]) is not terms
+    terms = cal.prepare(frequencies)
+    cal.set_offset_delay(1e-10)
+    assert cal.prepare(frequencies) is terms
+    cal.insert("load", np.zeros(len(frequencies)), frequencies)
+    assert cal.prepare(frequencies) is not terms
+
+
+def test_port_extension(cal):
+    """Test the port extension against the scalar correct_delay."""
+    frequencies = cal.model[0]
+    ones = np.ones(101, dtype=complex)
+    cal.set_offset_delay(2e-10)
+    s11, s21 = cal.apply_port_extension(ones, ones, frequencies)
+    f = frequencies[7]
+    assert np.isclose(s11[7], calibration.correct_delay(1, f, 2e-10, reflect=True))
+    assert np.isclose(s21[7], calibration.correct_delay(1, f, 2e-10))
+
+    factors = cal.port_extension_factors(frequencies)
+    version = cal.version
+    cal.set_port_extension(2, 1e-10, loss=1.0)
+    assert cal.version > version
+    assert cal.port_extension_factors(frequencies) is not factors
+    s11_ext, s21_ext = cal.apply_port_extension(ones, ones, frequencies)
+    assert np.allclose(s11_ext, s11)
+    assert np.isclose(s21_ext[7], calibration.correct_delay(1, f, 3e-10) * 10**0.05)
+
+
+def test_dataset_columns(cal):
+    """Test the columnar store and its per-frequency compatibility layer."""
+    dataset = cal.dataset
+    frequencies = cal.model[0]
+    assert len(dataset) == 101
+    assert np.array_equal(dataset.frequencies(), frequencies)
+    assert dataset.complete1port() and dataset.complete2port()
+    assert dataset.size_of("short") == 101
+    row = dataset.get(int(frequencies[3]))
+    assert row.freq == frequencies[3]
+    assert row.short == dataset.standards["short"][3]
+    assert row.e00 == dataset.terms["e00"][3]
+    assert dataset.get(1) is None
+    with pytest.raises(ValueError):
+        dataset.frequencies()[0] = 0
+    assert dataset.keys() == frequencies.tolist()
+    dataset.insert("open", 0.5, 5)
+    assert dataset.frequencies()[0] == 5
+    dataset[6] = row
+    assert dataset[6].short == row.short and dataset[6].e00 == row.e00
+    assert not dataset.complete1port()
+    with pytest.raises(KeyError):
+        dataset.insert("bogus", 0.5, 5)
+
+
+def test_dataset_text_roundtrip(cal):
+    """Test that a dataset survives formatting and parsing."""
+    dataset = calibration.CalDataSet().from_str(str(cal.dataset))
+    assert np.array_equal(dataset.freq, cal.dataset.freq)
+    for name in calibration.STANDARDS:
+        assert np.array_equal(dataset.standards[name], cal.dataset.standards[name])
+
+
+def test_calc_corrections_reports_bad_frequencies(cal):
+    """Test that every frequency with a singular solution is reported."""
+    frequencies = cal.model[0]
+    cal.insert("open", cal.dataset.standards["short"][[3, 9]], frequencies[[3, 9]])
+    with pytest.raises(ValueError, match="2 frequencies") as info:
+        cal.calc_corrections()
+    assert f"{frequencies[3]}Hz" in str(info.value)
+    assert f"{frequencies[9]}Hz" in str(info.value)
+    assert not cal.isCalculated
+
+
+def test_standard_models():
+    """Test the vectorized standard models against a single point."""
+    c = calibration.Calibration()
+    c.cal_element.short_is_ideal = False
+    c.cal_element.load_is_ideal = False
+    c.cal_element.load_c = 1e-13
+    frequencies = np.array([1e8, 1e9, 3e9])
+    short = c.gamma_short(frequencies)
+    load = c.gamma_load(frequencies)
+    assert short.shape == load.shape == (3,)
+    assert np.isclose(short[1], c.gamma_short(1e9))
+    assert np.allclose(c.gamma_open(frequencies), calibration.IDEAL_OPEN)
+    assert abs(load[2]) > abs(load[0])
+
+
+def test_validity_state_and_version(cal):
+    """Test the cached validity flags and the change counter."""
+    version = cal.version
+    assert cal.is_valid_1_port() and cal.is_valid_2_port()
+    frequencies = cal.model[0]
+    cal.insert("through", np.zeros(2), frequencies[:2])
+    assert cal.version > version
+    assert cal.is_valid_1_port() and not cal.is_valid_2_port()
+    version = cal.version
+    cal.dataset.insert("short", 0, frequencies[0])
+    assert cal.is_valid_1_port()
+    cal.update_state()
+    assert not cal.is_valid_1_port()
+    assert cal.version > version
+
+
+def test_binary_roundtrip(cal, tmp_path):
+    """Test saving and loading the binary format, with and without terms."""
+    cal.cal_element.load_r = 51.0
+    cal.notes = ["binary test"]
+    frequencies = cal.model[0]
+    raw = np.linspace(0.1, 0.5, 101) * 1j
+    expected = cal.apply(raw, raw, frequencies)
+
+    filename = str(tmp_path / "cal.npz")
+    cal.save(filename)
+    loaded = calibration.Calibration()
+    loaded.load(filename)
+    assert loaded.isCalculated
+    assert loaded.is_valid_2_port()
+    assert loaded.notes == ["binary test"]
+    assert loaded.cal_element.load_r == 51.0
+    assert np.allclose(loaded.apply(raw, raw, frequencies), expected)
+
+    cal.save(str(tmp_path / "raw.npz"), terms=False)
+    loaded.load(str(tmp_path / "raw.npz"))
+    assert not loaded.isCalculated
+    loaded.calc_corrections()
+    assert np.allclose(loaded.apply(raw, raw, frequencies), expected)
+
+
+def test_text_load_detects_format(cal, tmp_path):
+    """Test that a text file loaded over a solved calibration needs solving."""
+    cal.save(str(tmp_path / "cal.cal"))
+    cal.load(str(tmp_path / "cal.cal"))
+    assert not cal.isCalculated
+    assert cal.is_valid_2_port()
+
+
+CAL_TEXT = """# Calibration data for pynanovna
+! a note
+# Hz ShortR ShortI OpenR OpenI LoadR LoadI ThroughR ThroughI IsolationR IsolationI
+
+1000000 -1 0.1 1 0.2 0.01 0 0.9 0.1 0.001 0.002
+2000000 -1 0.2 1 0.3 0.02 0 0.8 0.2 0.003 0.004
+"""
+
+
+def test_text_bulk_parser():
+    """Test the vectorized text parser, including 11 column lines."""
+    dataset = calibration.CalDataSet().from_str(CAL_TEXT)
+    assert dataset.notes == "a note\n"
+    assert np.array_equal(dataset.freq, [1000000, 2000000])
+    assert dataset.standards["open"][1] == 1 + 0.3j
+    assert dataset.standards["isolation"][0] == 0.001 + 0.002j
+    assert dataset.size_of("thrurefl") == 0
+
+
+def test_text_parser_fallback(caplog):
+    """Test that malformed files still load with a warning per bad line."""
+    text = CAL_TEXT + "3000000 -1 0.2 bad\n"
+    dataset = calibration.CalDataSet().from_str(text)
+    assert np.array_equal(dataset.freq, [1000000, 2000000])
+    assert dataset.standards["isolation"][1] == 0.003 + 0.004j
+    assert "Illegal caldata. Line 7" in caplog.text
+
+
+def test_text_parser_sol_header(caplog):
+    """Test that through data under a sol header is loaded with a warning."""
+    text = "# Hz ShortR ShortI OpenR OpenI LoadR LoadI\n"
+    text += "1000000 -1 0.1 1 0.2 0.01 0 0.9 0.1\n"
+    dataset = calibration.CalDataSet().from_str(text)
+    assert dataset.standards["through"][0] == 0.9 + 0.1j
+    assert "Through data with sol header. 2: 1000000" in caplog.text
+
+
+def test_text_parser_no_data(recwarn):
+    """Test that a file with only a header loads empty, without warnings."""
+    dataset = calibration.CalDataSet().from_str(CAL_TEXT.split("\n\n")[0])
+    assert dataset.size_of("short") == 0
+    assert not recwarn.list
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "+3000000 -1 0 1 0 0 0",
+        "3e6 -1 0 1 0 0 0",
+        "3000000 inf 0 1 0 0 0",
+        "3000000 -1 0 +1 0 0 0",
+    ],
+)
+def test_text_parser_number_grammar(line, caplog):
+    """Test that the bulk parser rejects numbers the line parser rejects."""
+    text = "# Hz ShortR ShortI OpenR OpenI LoadR LoadI\n1000000 -1 0 1 0 0 0\n"
+    dataset = calibration.CalDataSet().from_str(text + line)
+    assert np.array_equal(dataset.freq, [1000000])
+    assert "Illegal caldata. Line 3" in caplog.text
+
+
+def test_library_lookup(cal, tmp_path):
+    """Test indexing, matching and caching of a calibration library."""
+    from pynanovna.calibration.library import CalibrationLibrary
+
+    cal.save(str(tmp_path / "any.cal"))
+    library = CalibrationLibrary(str(tmp_path))
+    assert library.get("1234", 1e9, 2e9, 101) is not None
+    assert library.get("1234", 1e9, 2e9, 51) is None
+
+    path = library.add(cal, "1234")
+    assert library.find("1234", 1e9 + 1, 2e9, 101) == path
+    assert library.find("5678", 1e9, 2e9, 101).endswith("any.cal")
+    assert library.get("1234", 1e9, 2e9, 101).terms_freq.tolist() == cal.terms_freq.tolist()
+
+    library = CalibrationLibrary(str(tmp_path), cache_size=1)
+    found = library.get("1234", 1e9, 2e9, 101)
+    assert found.isCalculated and found.source == "1234_1000000000_2000000000_101.npz"
+    assert list(library._cache) == [path]
+    library.get("5678", 1e9, 2e9, 101)
+    assert path not in library._cache
+
+
+def test_library_returns_copies(cal, tmp_path, make_vna, make_driver):
+    """Test that changing a selected calibration leaves the library as is."""
+    from pynanovna.calibration.library import CalibrationLibrary
+
+    library = CalibrationLibrary(str(tmp_path))
+    library.add(cal, "1234")
+    driver = make_driver()
+    driver.SN = "1234"
+    vna = make_vna(driver)
+    vna.sweep_interval, vna.sweep_points = (1e9, 2e9), 101
+    vna.calibration_library = library
+    vna._select_calibration()
+    vna.calibration.set_port_extension(1, 1e-10)
+    vna.calibration.insert("short", [0.5 + 0j], [3000000000])
+    again = library.get("1234", 1e9, 2e9, 101)
+    assert again is not vna.calibration
+    assert not again.port_extension.is_active()
+    assert 3000000000 not in again.dataset
+
+    # without a match a changed calibration is kept, a library one dropped
+    changed = vna.calibration
+    vna.sweep_points = 51
+    vna._select_calibration()
+    assert vna.calibration is changed
+    vna.sweep_points = 101
+    vna._select_calibration()
+    vna.sweep_points = 51
+    vna._select_calibration()
+    assert not vna.calibration.isCalculated
+    assert vna.calibration.port_extension == changed.port_extension
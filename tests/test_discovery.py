@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+from serial.tools.list_ports_common import ListPortInfo
+
+from pynanovna.hardware import discovery
+
+
+def _port(device: str, serial_number: str) -> tuple[ListPortInfo, str]:
+    port_info = ListPortInfo(device)
+    port_info.vid, port_info.pid = 0x0483, 0x5740
+    port_info.serial_number = serial_number
+    return port_info, "NanoVNA"
+
+
+@pytest.fixture
+def fake_ports(monkeypatch):
+    """Fixture with fake ports, probing takes 0.1 s each."""
+    ports = [_port(f"/dev/ttyACM{i}", f"SN{i}") for i in range(4)]
+    probed = []
+
+    def probe(port_info, typename):
+        probed.append((port_info.device, threading.get_ident()))
+        time.sleep(0.1)
+        return discovery._descriptor(port_info, typename)._replace(variant="H4")
+
+    monkeypatch.setattr(discovery, "get_ports", lambda: ports)
+    monkeypatch.setattr(discovery, "probe", probe)
+    return ports, probed
+
+
+def test_discover_parallel(fake_ports, tmp_path):
+    """Test that ports are probed concurrently and remembered."""
+    ports, probed = fake_ports
+    cache_file = str(tmp_path / "devices.json")
+    start = time.monotonic()
+    devices = discovery.discover(cache_file)
+    assert time.monotonic() - start < 0.3
+    assert len({thread for _, thread in probed}) == 4
+    assert [d.port for d in devices] == [f"/dev/ttyACM{i}" for i in range(4)]
+    assert devices[2].usb_serial == "SN2" and devices[2].variant == "H4"
+
+    probed.clear()
+    assert discovery.discover(cache_file) == devices
+    assert not probed
+
+    ports[1] = _port("/dev/ttyACM1", "SN9")
+    devices = discovery.discover(cache_file)
+    assert [device for device, _ in probed] == ["/dev/ttyACM1"]
+    assert devices[1].usb_serial == "SN9"
+    discovery.discover(cache_file, refresh=True)
+    assert len(probed) == 5
+
+
+def test_discover_bad_cache(fake_ports, tmp_path):
+    """Test that an unreadable cache is ignored."""
+    ports, probed = fake_ports
+    cache_file = tmp_path / "devices.json"
+    cache_file.write_text("{not json")
+    assert len(discovery.discover(str(cache_file))) == 4
+    assert len(probed) == 4
+    assert len(discovery.discover(None)) == 4
+    assert len(probed) == 8
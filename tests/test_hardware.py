@@ -0,0 +1,268 @@
+import time
+from struct import pack
+
+import numpy as np
+import pytest
+
+from pynanovna.hardware.NanoVNA import parse_scan
+from pynanovna.hardware.NanoVNA_H import NanoVNA_H
+from pynanovna.hardware.NanoVNA_H4 import NanoVNA_H4
+from pynanovna.hardware import Hardware
+from pynanovna.hardware import NanoVNA_V2 as V2
+from pynanovna.hardware.NanoVNA_V2 import NanoVNA_V2, decode_fifo
+from pynanovna.hardware import VNABase
+from pynanovna.hardware.profile import ProfileCache
+from pynanovna.hardware.Serial import read_response
+from pynanovna.hardware.Version import Version
+
+
+@pytest.fixture
+def h4(fake):
+    """Fixture with an H4 driver talking to the fake device."""
+    return NanoVNA_H4(fake)
+
+
+def test_read_sweep_scan_mask(h4, fake):
+    """Test that read_sweep returns arrays for scan mask devices."""
+    h4.datapoints = 51
+    h4.set_sweep(1000000, 51000000)
+    s11, s21, frequencies = h4.read_sweep()
+    assert s11.dtype == s21.dtype == np.complex128
+    assert np.array_equal(frequencies, fake.frequencies())
+    assert np.allclose(s11, fake.s11(frequencies))
+    assert np.allclose(s21, fake.s21(frequencies))
+    assert h4.read_values("data 1")[3] == f"{s21[3].real} {s21[3].imag}"
+
+
+def test_read_sweep_single_scan(h4, fake):
+    """Test that each sweep is one scan and the frequencies are cached."""
+    h4.set_sweep(1000000, 101000000)
+    commands = len(fake.commands)
+    _, _, frequencies = h4.read_sweep()
+    h4.read_sweep()
+    assert fake.commands[commands:] == [
+        "scan 1000000 101000000 101 0b111",
+        "scan 1000000 101000000 101 0b110",
+    ]
+    assert h4.sweep_frequencies() is frequencies
+    h4.set_sweep(2000000, 102000000)
+    assert h4.sweep_frequencies(read=False) is None
+    assert h4.read_sweep()[2][0] == 2000000
+
+
+def test_read_sweep_data_commands(fake):
+    """Test read_sweep through the frequencies and data commands."""
+    fake.version = "0.1.0"
+    h4 = NanoVNA_H4(fake)
+    h4.sweep_method = "sweep"
+    h4.set_sweep(1000000, 101000000)
+    s11, s21, frequencies = h4.read_sweep()
+    assert np.array_equal(frequencies, fake.frequencies())
+    assert np.allclose(s11, fake.s11(frequencies))
+    assert np.allclose(s21, fake.s21(frequencies))
+    commands = len(fake.commands)
+    h4.read_sweep()
+    assert fake.commands[commands:] == ["data 0", "data 1"]
+
+
+def test_read_sweep_binary_scan(make_fake):
+    """Test binary scan transfers on firmware that supports them."""
+    fake = make_fake(binary=True)
+    h4 = NanoVNA_H4(fake)
+    assert "Scan binary" in h4.features
+    assert "Scan binary" not in NanoVNA_H4(make_fake()).features
+    h4.datapoints = 51
+    h4.set_sweep(1000000, 51000000)
+    s11, s21, frequencies = h4.read_sweep()
+    assert fake.commands[-1].endswith(" 0b10000111")
+    assert np.array_equal(frequencies, fake.frequencies())
+    assert np.allclose(s11, fake.s11(frequencies), atol=1e-6)
+    assert np.allclose(s21, fake.s21(frequencies), atol=1e-6)
+
+
+def test_cached_profile(make_fake, monkeypatch, tmp_path):
+    """Test that reconnecting uses the cached profile instead of the handshake."""
+    monkeypatch.setattr(VNABase, "profiles", ProfileCache())
+    fakes = [make_fake(binary=True, sn="AAAA") for _ in range(2)]
+    for fake in fakes:
+        fake.port = "/dev/ttyACM0"
+    first, second = NanoVNA_H4(fakes[0]), NanoVNA_H4(fakes[1])
+    assert "help" in fakes[0].commands
+    assert fakes[0].commands.count("sn") == 1 and first.SN == "AAAA"
+    assert fakes[1].commands[:2] == ["version", "sn"]
+    assert not {"help", "info"} & set(fakes[1].commands)
+    assert second.features == first.features and "Scan binary" in second.features
+    assert second.sweep_method == "scan_mask"
+    fakes[1].version = "1.2.21"
+    NanoVNA_H4(fakes[1])
+    assert "help" in fakes[1].commands
+
+    # another device on the same port, or one without serial number
+    for sn in ("BBBB", None):
+        fake = make_fake(binary=True, sn=sn)
+        fake.port = "/dev/ttyACM0"
+        NanoVNA_H4(fake)
+        assert "help" in fake.commands
+    assert VNABase.profiles.key(NanoVNA_H4(fake)) is None
+
+    cache = ProfileCache(str(tmp_path / "profiles.json"))
+    first.board_revision = Version("2.0.4")
+    first.txPowerRanges = [((140e6, 4.4e9), ["Maximum"])]
+    cache.save(first)
+    vna = NanoVNA_H4.__new__(NanoVNA_H4)
+    vna.serial, vna.version, vna.device_id = fakes[0], first.version, "AAAA"
+    assert ProfileCache(cache.cache_file).load(vna)
+    assert vna.SN == first.SN
+    assert vna.features == first.features
+    assert vna.valid_datapoints == first.valid_datapoints
+    assert vna.board_revision == first.board_revision
+    assert vna.txPowerRanges == first.txPowerRanges
+
+    # profiles only go to disk when asked to
+    memory = VNABase.profiles
+    assert memory.cache_file is None
+    memory.use_file(str(tmp_path / "opt-in.json"))
+    memory.save(first)
+    assert ProfileCache(memory.cache_file).load(vna)
+
+
+def test_get_vna_cached_variant(make_fake):
+    """Test that a cached variant is only used if the device still matches."""
+    assert type(Hardware.get_VNA(make_fake(), "H4")) is NanoVNA_H4
+    # an H4 swapped for an H on the same port opens fine as an H4
+    assert type(Hardware.get_VNA(make_fake(board="NanoVNA-H"), "H4")) is NanoVNA_H
+    assert type(Hardware.get_VNA(make_fake(), "H")) is NanoVNA_H4
+
+
+def test_v2_handshake(make_fake_v2, monkeypatch):
+    """Test that the V2 handshake reads all version registers in one write."""
+    monkeypatch.setattr(V2.tty, "setraw", lambda fd: None)
+    fake = make_fake_v2()
+    started = time.monotonic()
+    vna = NanoVNA_V2(fake)
+    assert time.monotonic() - started < 1.0
+    assert vna.version == Version("1.0.3")
+    assert vna.board_revision == Version("2.0.4")
+    assert vna.sweep_max_freq_Hz == 4400e6
+    assert fake.writes[0] == bytes([0x10, 0xF3, 0x10, 0xF4, 0x10, 0xF0, 0x10, 0xF2])
+    assert vna.read_firmware() == "HW: 2.0.4\nFW: 1.0.3"
+    s11, s21, frequencies = vna.read_sweep()
+    assert len(s11) == len(frequencies) == 101
+    assert np.allclose(s11, np.arange(101) / 100 + 0.5j)
+    assert np.allclose(s21, -np.arange(101) / 100 + 0.25j)
+    vna.set_sweep(1e6, 101e6)
+    writes = len(fake.writes)
+    frequencies = vna.sweep_frequencies(read=False)
+    assert frequencies[0] == 1e6 and frequencies[-1] == 101e6
+    assert len(fake.writes) == writes
+    fake.registers[0x20] = 0
+    with pytest.raises(IOError):
+        vna.read_sweep()
+
+    # missed reads are retried after a protocol reset
+    fake = make_fake_v2(missed_reads=2)
+    vna = NanoVNA_V2(fake)
+    assert vna.version == Version("1.0.3")
+    assert fake.writes[1] == V2.RESET_PROTOCOL
+    with pytest.raises(IOError):
+        NanoVNA_V2(make_fake_v2(missed_reads=8))
+
+
+def test_v2_averaging(make_fake_v2, monkeypatch):
+    """Test that values per frequency are read in one sweep and averaged."""
+    monkeypatch.setattr(V2.tty, "setraw", lambda fd: None)
+    fake = make_fake_v2()
+    vna = NanoVNA_V2(fake)
+    vna.datapoints = 51
+    vna.set_sweep(1e6, 51e6)
+    vna.set_averaging(4, spread=True)
+    assert fake.registers[0x22] == 4
+    s11, s21, _ = vna.read_sweep()
+    # s11 of the records is index / 100 + 0.5j plus 0, 1, 2, 3 hundredths
+    assert np.allclose(s11, (np.arange(51) + 1.5) / 100 + 0.5j)
+    assert np.allclose(s21, -np.arange(51) / 100 + 0.25j)
+    assert vna.spread.shape == (2, 51)
+    assert np.allclose(vna.spread[0], np.std([0, 1, 2, 3]) / 100)
+    assert np.allclose(vna.spread[1], 0.0, atol=1e-6)
+    vna.set_averaging(1)
+    assert fake.registers[0x22] == 1
+    vna.read_sweep()
+    assert vna.spread is None
+    with pytest.raises(ValueError):
+        vna.set_averaging(0)
+    fake = make_fake_v2()
+    fake.registers[0xF4] = 1
+    with pytest.raises(ValueError):
+        NanoVNA_V2(fake).set_averaging(4)
+    assert fake.registers[0x22] == 1
+
+
+def test_v2_raw_samples(make_fake_v2, monkeypatch):
+    """Test that raw samples are streamed in one buffer and the mode restored."""
+    monkeypatch.setattr(V2.tty, "setraw", lambda fd: None)
+    fake = make_fake_v2()
+    vna = NanoVNA_V2(fake)
+    chunks = []
+    for samples in vna.raw_samples(records=300):
+        assert fake.registers[0x26] == 1
+        chunks.append(samples)
+        if len(chunks) == 2:
+            expected = np.arange(300 * 16, 600 * 16).astype(np.int16)
+            assert np.array_equal(samples, expected)
+            break
+    assert chunks[0] is chunks[1] and chunks[0].dtype == np.int16
+    assert fake.registers[0x26] == 0
+    s11, _, _ = vna.read_sweep()
+    assert np.allclose(s11, np.arange(101) / 100 + 0.5j)
+
+
+def test_parse_table_garbage():
+    """Test that output with a garbled line is rejected."""
+    assert VNABase.parse_table(b"1 2\r\n3 4\r\n", 2).shape == (2, 2)
+    with pytest.raises(ValueError):
+        VNABase.parse_table(b"1 2\r\n3 x\r\n5 6\r\n7 8\r\n", 2)
+    with pytest.raises(ValueError):
+        VNABase.parse_table(b"1 2\r\n3 4\r\n5\r\n", 2)
+
+
+def test_decode_fifo():
+    """Test the vectorized FIFO decoding against struct unpacking."""
+    rng = np.random.default_rng(1)
+    order = rng.permutation(5)
+    values = rng.integers(-(2**20), 2**20, size=(5, 6))
+    data = b"".join(pack("<iiiiiihxxxxxx", *values[i], int(i)) for i in order)
+    sweepdata = decode_fifo(data + pack("<iiiiiihxxxxxx", 1, 1, 1, 1, 1, 1, 9), 5)
+    fwd = values[:, 0] + 1j * values[:, 1]
+    assert np.allclose(sweepdata[0], (values[:, 2] + 1j * values[:, 3]) / fwd)
+    assert np.allclose(sweepdata[1], (values[:, 4] + 1j * values[:, 5]) / fwd)
+
+
+def test_read_response_framing(fake):
+    """Test that stale output is skipped and the echo and prompt removed."""
+    fake.write(b"version\r")
+    fake._output[:0] = b"old output\r\nch> "
+    assert read_response(fake, b"version\r\n", 1.0) == b"1.2.20\r\n"
+    with pytest.raises(IOError):
+        read_response(fake, b"version\r\n", 0.01)
+
+
+@pytest.mark.parametrize("mask", [0b001, 0b010, 0b011, 0b100, 0b110, 0b111])
+def test_parse_scan(fake, mask):
+    """Test the mask-aware parsing of a whole scan response."""
+    command = f"scan 1000000 2000000 11 {mask:#05b}"
+    fake.write(f"{command}\r".encode("ascii"))
+    raw = read_response(fake, f"{command}\r\n".encode("ascii"), 1.0)
+    frequencies, s11, s21 = parse_scan(raw, mask)
+    f = fake.frequencies()
+    assert (frequencies is None) == (not mask & 0b001)
+    assert (s11 is None) == (not mask & 0b010)
+    assert (s21 is None) == (not mask & 0b100)
+    if frequencies is not None:
+        assert frequencies.dtype == np.int64
+        assert np.array_equal(frequencies, f)
+    if s11 is not None:
+        assert np.allclose(s11, fake.s11(f))
+    if s21 is not None:
+        assert np.allclose(s21, fake.s21(f))
+    with pytest.raises(ValueError):
+        parse_scan(raw + b"1.0\r\n", mask | 0b110)
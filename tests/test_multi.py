@@ -0,0 +1,50 @@
+import time
+
+import numpy as np
+import pytest
+
+import pynanovna
+
+
+@pytest.fixture
+def vnas(make_vna, make_driver):
+    """Fixture with a fast and a slow fake VNA."""
+    return [make_vna(make_driver(delay=0.002)), make_vna(make_driver(delay=0.02))]
+
+
+def test_multi_wait_all(vnas):
+    """Test that every sweep of every device is delivered in order."""
+    with pynanovna.MultiVNA(vnas, size=64, policy="wait_all") as multi:
+        sets = [multi.get(timeout=1.0) for _ in range(5)]
+    for i, (fast, slow) in enumerate(sets, 1):
+        assert fast.sequence == slow.sequence == i
+        assert np.all(slow.raw_s11 == i)
+
+
+def test_multi_nearest(vnas):
+    """Test that sweeps are aligned to the slowest device."""
+    with pynanovna.MultiVNA(vnas, size=64, policy="nearest") as multi:
+        sets = [multi.get(timeout=1.0) for _ in range(3)]
+    for fast, slow in sets:
+        assert fast.start_time <= slow.end_time and slow.start_time <= fast.end_time
+    assert sets[-1][0].sequence > 3 * sets[-1][1].sequence
+
+
+def test_multi_latest(vnas):
+    """Test that the newest sweeps are returned as soon as one is new."""
+    multi = pynanovna.MultiVNA(vnas, policy="latest").start()
+    first = multi.get(timeout=1.0)
+    second = multi.get(timeout=1.0)
+    time.sleep(0.05)
+    third = multi.get(timeout=1.0)
+    sets = [first, second, third] + [multi.get(timeout=1.0) for _ in range(10)]
+    multi.stop()
+    # every set has a newer sweep than the one before
+    for previous, current in zip(sets, sets[1:]):
+        assert any(s is not p for s, p in zip(current, previous))
+    assert second[1].sequence - first[1].sequence <= 1
+    assert third[0].sequence > second[0].sequence
+    with pytest.raises(RuntimeError):
+        multi.get()
+    with pytest.raises(ValueError):
+        pynanovna.MultiVNA(vnas, policy="fastest")
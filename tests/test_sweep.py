@@ -0,0 +1,52 @@
+import numpy as np
+
+from pynanovna.sweep import Sweep
+
+
+def _sweep(calls: list) -> Sweep:
+    raw_s11 = np.array([0.5 + 0j, 0.1j, -0.2 + 0j])
+    raw_s21 = np.array([0.1 + 0j, 0.2 + 0j, 0.3 + 0j])
+
+    def calibrate():
+        calls.append(1)
+        return raw_s11 * 0.5, raw_s21 * 2
+
+    return Sweep(raw_s11, raw_s21, np.array([1, 2, 3]), calibrate, 7, 1.0, 1.5)
+
+
+def test_sweep_lazy_calibration():
+    """Test that the calibration runs once and only when needed."""
+    calls = []
+    sweep = _sweep(calls)
+    assert np.allclose(sweep.raw_s11, [0.5, 0.1j, -0.2])
+    assert not calls and not sweep.calibrated
+    s11, s21, frequencies = sweep
+    assert np.allclose(s11, [0.25, 0.05j, -0.1])
+    assert sweep.s21 is s21 and sweep[2] is frequencies
+    assert sweep[:2] == (s11, s21)
+    assert calls == [1] and sweep.calibrated
+    assert sweep.calibrate() is sweep and calls == [1]
+    assert sweep.sequence == 7 and sweep.duration == 0.5
+
+
+def test_sweep_derived_values():
+    """Test that derived values are computed from the calibrated data once."""
+    sweep = _sweep([])
+    assert np.allclose(sweep.s11_db, 20 * np.log10([0.25, 0.05, 0.1]))
+    assert sweep.s11_db is sweep.s11_db
+    assert np.allclose(sweep.s21_phase, 0)
+    assert np.isclose(sweep.vswr[0], 1.25 / 0.75)
+    assert np.isclose(sweep.impedance()[0], 50 * 1.25 / 0.75)
+    assert np.isclose(sweep.impedance(75)[0], 75 * 1.25 / 0.75)
+    assert Sweep(sweep.raw_s11, sweep.raw_s21, [1, 2, 3]).s11 is sweep.raw_s11
+
+
+def test_sweep_keeps_its_calibration(make_vna, make_driver):
+    """Test that a sweep read late uses the calibration it was taken with."""
+    vna = make_vna(make_driver())
+    before = vna._new_sweep(0.0, *vna.vna.read_sweep())
+    vna.set_port_extension(1, 0.01)
+    after = vna._new_sweep(0.0, *vna.vna.read_sweep())
+    vna.calibration = None
+    assert np.array_equal(before.s11, before.raw_s11)
+    assert not np.allclose(after.s11, after.raw_s11)